@@ -0,0 +1,90 @@
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Tuple
+import json, pathlib, time
+from backend.agent_runner import AgentOverloaded, AgentRunner
+from backend.agents import load_agent
+from backend.metrics import REGISTRY, add_routes
+from backend.responses import CodecJSONResponse
+from backend.result_cache import ResultCache
+
+CONFIG = pathlib.Path(__file__).resolve().parents[1] / "config" / "system_config.json"
+
+def load_config(path: pathlib.Path = CONFIG) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+_CONFIG = load_config()
+GROUPS: Dict[str, List[str]] = _CONFIG["gateway_groups"]
+CACHE = ResultCache.from_config(_CONFIG.get("result_cache"))
+RUNNER = AgentRunner.from_config(_CONFIG.get("agent_limits"))
+
+AGENT_REQUESTS = REGISTRY.counter("agent_requests_total", "Agent calls by outcome (cache status or error)",
+                                  ["agent", "outcome"])
+AGENT_SECONDS = REGISTRY.histogram("agent_request_seconds", "Agent call latency, including queueing", ["agent"])
+AGENT_REJECTED = REGISTRY.counter("agent_rejected_total", "Calls refused by the concurrency limiter",
+                                  ["agent", "code"])
+REGISTRY.gauge("agent_queue_depth", "Calls waiting for a concurrency slot", ["agent"],
+               fn=lambda: {a: s["waiting"] for a, s in RUNNER.stats().items()})
+REGISTRY.gauge("agent_running", "Calls currently executing", ["agent"],
+               fn=lambda: {a: s["active"] for a, s in RUNNER.stats().items()})
+
+CacheMode = Literal["use", "bypass", "refresh"]
+
+class RunRequest(BaseModel):
+    payload: Dict[str, Any] = {}
+
+async def call_agent(name: str, payload: Any, cache: CacheMode = "use") -> Tuple[Any, str]:
+    """Run an agent through the result cache and its concurrency limiter;
+    returns (result, cache status) and raises AgentOverloaded."""
+    fn = load_agent(name)
+    started = time.perf_counter()
+    try:
+        result, status = await CACHE.acall(name, payload, lambda p: RUNNER.run(name, fn, p), cache)
+    except AgentOverloaded as e:
+        AGENT_REJECTED.labels(name, str(e.status_code)).inc()
+        raise
+    except Exception:
+        AGENT_REQUESTS.labels(name, "error").inc()
+        raise
+    AGENT_SECONDS.labels(name).observe(time.perf_counter() - started)
+    AGENT_REQUESTS.labels(name, status).inc()
+    return result, status
+
+async def invoke(name: str, payload: Dict[str, Any], response: Response, cache: CacheMode = "use"):
+    """``call_agent`` for a route: X-Cache on the response, overload as 429/503."""
+    try:
+        result, status = await call_agent(name, payload, cache)
+    except AgentOverloaded as e:
+        raise HTTPException(e.status_code, e.detail, headers={"Retry-After": str(e.retry_after)})
+    response.headers["X-Cache"] = status
+    return result
+
+def make_group_app(group: str, agent_names: List[str] = None) -> FastAPI:
+    """One agent group's gateway: ``GET /health`` and ``POST /agent/{name}``."""
+    names = list(agent_names if agent_names is not None else GROUPS[group])
+    members = frozenset(names)
+    label = group[:-1] if group.endswith("s") else group
+    app = FastAPI(title=f"{label.capitalize()} Agents Gateway", version="1.0",
+                  default_response_class=CodecJSONResponse)
+    add_routes(app)
+
+    def _check(name: str):
+        if name not in members:
+            raise HTTPException(status_code=404, detail=f"Unknown {label} agent {name}")
+
+    @app.get("/health")
+    def health():
+        return {"group": group, "agents": names, "status": "ok"}
+
+    @app.post("/agent/{name}")
+    async def run_agent(name: str, req: RunRequest, response: Response, cache: CacheMode = "use"):
+        _check(name)
+        return await invoke(name, req.payload, response, cache)
+
+    @app.delete("/agent/{name}/cache")
+    def invalidate(name: str):
+        _check(name)
+        return {"agent": name, "invalidated": CACHE.invalidate(name)}
+
+    return app
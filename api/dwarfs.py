@@ -1,20 +1,4 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Any, Dict
-from backend.agents import load_agent
+from api.agent_group import GROUPS, make_group_app
 
-AGENT_NAMES = ["Pluto","Ceres","Eris","Haumea","Makemake"]
-app = FastAPI(title="Dwarf Agents Gateway", version="1.0")
-
-class RunRequest(BaseModel):
-    payload: Dict[str, Any] = {}
-
-@app.get("/health")
-def health():
-    return {"group": "dwarfs", "agents": AGENT_NAMES, "status": "ok"}
-
-@app.post("/agent/{name}")
-def run_agent(name: str, req: RunRequest):
-    if name not in AGENT_NAMES:
-        raise HTTPException(status_code=404, detail=f"Unknown dwarf agent {name}")
-    return load_agent(name)(req.payload)
+AGENT_NAMES = GROUPS["dwarfs"]
+app = make_group_app("dwarfs", AGENT_NAMES)
@@ -1,11 +1,54 @@
+"""Lightweight Flask gateway.
+
+``POST /run/<agent>`` runs the agent in this process through a bounded
+``WorkQueue``: agents known to finish within ``FLASK_GATEWAY_SYNC_MS`` usually
+answer 200 with the result, others answer 202 with a job id to poll at
+``GET /jobs/<id>`` (``?wait=`` seconds blocks until the job finishes).  A full
+queue answers 429 with Retry-After; an agent without a module answers 404.
+"""
+import os, pathlib, sys
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
 from flask import Flask, request, jsonify
+from backend.work_queue import QueueFull, UnknownAgent, WorkQueue
+
+MAX_WAIT = 30.0
+QUEUE = WorkQueue.from_env()
 app = Flask(__name__)
 
 @app.get("/")
 def info():
-    return jsonify({"gateway": "ok", "usage": "POST /api/run/<agent>"})
+    return jsonify({"gateway": "ok", "usage": "POST /run/<agent>, GET /jobs/<job_id>"})
 
 @app.post("/run/<agent>")
 def run_agent(agent):
     payload = request.get_json(silent=True) or {}
-    return jsonify({"agent": agent, "received": payload, "status": "queued"})
+    try:
+        job = QUEUE.submit(agent, payload)
+    except UnknownAgent as e:
+        return jsonify({"error": str(e)}), 404
+    except QueueFull as e:
+        return jsonify({"error": e.detail}), 429, {"Retry-After": str(e.retry_after)}
+    wait = min(request.args.get("wait", 0.0, type=float), MAX_WAIT)
+    if wait > 0:
+        job.wait(wait)
+    if job.done:
+        return jsonify(job.summary())
+    return jsonify({**job.summary(), "status_url": f"/jobs/{job.id}"}), 202, {"Location": f"/jobs/{job.id}"}
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    job = QUEUE.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job {job_id}"}), 404
+    wait = min(request.args.get("wait", 0.0, type=float), MAX_WAIT)
+    if wait > 0 and not job.done:
+        job.wait(wait)
+    return jsonify(job.summary())
+
+@app.get("/jobs")
+def jobs():
+    return jsonify(QUEUE.stats())
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), threaded=True)
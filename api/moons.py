@@ -1,20 +1,4 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Any, Dict
-from backend.agents import load_agent
+from api.agent_group import GROUPS, make_group_app
 
-AGENT_NAMES = ["Luna","Phobos","Deimos","Io","Europa","Ganymede","Callisto","Titan","Enceladus","Triton","Charon"]
-app = FastAPI(title="Moon Agents Gateway", version="1.0")
-
-class RunRequest(BaseModel):
-    payload: Dict[str, Any] = {}
-
-@app.get("/health")
-def health():
-    return {"group": "moons", "agents": AGENT_NAMES, "status": "ok"}
-
-@app.post("/agent/{name}")
-def run_agent(name: str, req: RunRequest):
-    if name not in AGENT_NAMES:
-        raise HTTPException(status_code=404, detail=f"Unknown moon agent {name}")
-    return load_agent(name)(req.payload)
+AGENT_NAMES = GROUPS["moons"]
+app = make_group_app("moons", AGENT_NAMES)
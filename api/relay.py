@@ -1,31 +1,159 @@
+"""Authenticated relay from the public edge to the private gateway's /task.
+
+Two entry points share the same bearer-token check:
+
+* ``handler`` -- the serverless ``BaseHTTPRequestHandler``.  It reuses pooled
+  keep-alive connections to ``GATEWAY_URL`` and copies request and response
+  bodies in chunks instead of buffering them.
+* ``app`` -- an ASGI app (``uvicorn api.relay:app``) for long-running hosts,
+  relaying many requests concurrently on one event loop through an httpx
+  connection pool.  Requires ``httpx``.
+
+``RELAY_TIMEOUT`` sets the upstream timeout in seconds (default 10) and
+``RELAY_POOL_SIZE`` the number of kept-alive upstream connections.
+"""
 from http.server import BaseHTTPRequestHandler
-import json, os, urllib.request
+import http.client, json, os, queue, urllib.parse
 
 GATEWAY_URL = os.environ["GATEWAY_URL"]        # e.g. https://<your-tunnel>.trycloudflare.com
 API_TOKEN   = os.environ["AIKRE8TIVE_TOKEN"]    # shared secret
+RELAY_TIMEOUT = float(os.getenv("RELAY_TIMEOUT", "10"))
+RELAY_POOL_SIZE = int(os.getenv("RELAY_POOL_SIZE", "16"))
+CHUNK = 64 * 1024
+
+_UPSTREAM = urllib.parse.urlsplit(GATEWAY_URL)
+_TASK_PATH = (_UPSTREAM.path.rstrip("/") or "") + "/task"
+_TASK_URL = urllib.parse.urlunsplit((_UPSTREAM.scheme, _UPSTREAM.netloc, _TASK_PATH, "", ""))
+_CONNS: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=RELAY_POOL_SIZE)
+
+def _checkout():
+    try:
+        return _CONNS.get_nowait(), True
+    except queue.Empty:
+        cls = http.client.HTTPSConnection if _UPSTREAM.scheme == "https" else http.client.HTTPConnection
+        return cls(_UPSTREAM.netloc, timeout=RELAY_TIMEOUT), False
+
+def _checkin(conn):
+    try: _CONNS.put_nowait(conn)
+    except queue.Full: conn.close()
 
 class handler(BaseHTTPRequestHandler):
     def _deny(self, code=401, msg="unauthorized"):
         self.send_response(code); self.end_headers()
         self.wfile.write(json.dumps({"error": msg}).encode())
 
+    def _send_upstream(self, length, first):
+        """Send headers and body upstream and return (conn, response).  A stale
+        pooled connection is retried once when the whole body is still in hand."""
+        while True:
+            conn, reused = _checkout()
+            try:
+                conn.putrequest("POST", _TASK_PATH, skip_accept_encoding=True)
+                conn.putheader("Content-Type", "application/json")
+                conn.putheader("Content-Length", str(length))
+                conn.endheaders()
+                conn.send(first)
+                sent = len(first)
+                while sent < length:
+                    chunk = self.rfile.read(min(CHUNK, length - sent))
+                    if not chunk: break
+                    conn.send(chunk); sent += len(chunk)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                conn.close()
+                if not (reused and len(first) == length):
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
     def do_POST(self):
         if self.headers.get("Authorization") != f"Bearer {API_TOKEN}":
             return self._deny()
         try:
             length = int(self.headers.get("content-length", "0"))
-            body = self.rfile.read(length)
-            req  = urllib.request.Request(
-                f"{GATEWAY_URL}/task",
-                data=body,
-                headers={"Content-Type":"application/json"},
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                data = resp.read()
-                self.send_response(resp.status)
-                self.send_header("Content-Type","application/json")
-                self.end_headers()
-                self.wfile.write(data)
+            first = self.rfile.read(min(CHUNK, length)) if length else b""
+            conn, resp = self._send_upstream(length, first)
         except Exception as e:
-            self._deny(502, str(e))
+            return self._deny(502, str(e))
+        try:
+            self.send_response(resp.status)
+            self.send_header("Content-Type", resp.getheader("Content-Type", "application/json"))
+            self.end_headers()
+            while True:
+                chunk = resp.read1(CHUNK)
+                if not chunk: break
+                self.wfile.write(chunk)
+            resp.close()  # response fully read: the connection can be reused
+        except Exception:
+            conn.close()
+            return
+        if resp.will_close: conn.close()
+        else: _checkin(conn)
+
+_client = None
+
+def _get_client():
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            timeout=RELAY_TIMEOUT,
+            limits=httpx.Limits(max_connections=RELAY_POOL_SIZE * 4,
+                                max_keepalive_connections=RELAY_POOL_SIZE))
+    return _client
+
+async def _reply(send, status, body: dict):
+    data = json.dumps(body).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())]})
+    await send({"type": "http.response.body", "body": data})
+
+async def app(scope, receive, send):
+    global _client
+    if scope["type"] == "lifespan":
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                _get_client()
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                if _client is not None:
+                    await _client.aclose(); _client = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    if scope["method"] != "POST":
+        return await _reply(send, 405, {"error": "method not allowed"})
+    headers = dict(scope["headers"])
+    if headers.get(b"authorization", b"").decode("latin-1") != f"Bearer {API_TOKEN}":
+        return await _reply(send, 401, {"error": "unauthorized"})
+
+    async def body():
+        while True:
+            msg = await receive()
+            if msg.get("body"): yield msg["body"]
+            if not msg.get("more_body"): return
+
+    # the upstream encoding is passed through as is, so only ask for what the client accepts
+    upstream_headers = {"Content-Type": "application/json",
+                        "Accept-Encoding": headers.get(b"accept-encoding", b"identity").decode("latin-1")}
+    if b"content-length" in headers:
+        upstream_headers["Content-Length"] = headers[b"content-length"].decode()
+    client = _get_client()
+    try:
+        req = client.build_request("POST", _TASK_URL, content=body(), headers=upstream_headers)
+        resp = await client.send(req, stream=True)
+    except Exception as e:
+        return await _reply(send, 502, {"error": str(e)})
+    try:
+        out = [(b"content-type", resp.headers.get("content-type", "application/json").encode())]
+        if "content-encoding" in resp.headers:
+            out.append((b"content-encoding", resp.headers["content-encoding"].encode()))
+        await send({"type": "http.response.start", "status": resp.status_code, "headers": out})
+        async for chunk in resp.aiter_raw(CHUNK):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        await resp.aclose()
@@ -0,0 +1,78 @@
+"""All agent groups in one process.
+
+Each group from ``config/system_config.json`` keeps its own URLs under a
+prefix (``/core/health``, ``/moons/agent/Io``, ...) and ``/agent/{name}``
+routes to the owning group through a precomputed name -> group dict.
+``POST /pipeline`` runs a DAG of agent steps in this process (see
+``backend.pipeline``) instead of one HTTP round-trip per step.
+Agent modules are imported on first use by the registry, not at startup.
+"""
+import os, pathlib, sys
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from api.agent_group import CACHE, GROUPS, RUNNER, CacheMode, RunRequest, call_agent, invoke, make_group_app
+from backend.agents import REGISTRY
+from backend.metrics import REGISTRY as METRICS, add_routes
+from backend.pipeline import PipelineError, Step, run_pipeline, validate
+from backend.responses import CodecJSONResponse
+
+ROUTES = {name: group for group, names in GROUPS.items() for name in names}
+MAX_PIPELINE_STEPS = 64
+MAX_PIPELINE_TIMEOUT = 120.0
+PIPELINE_SECONDS = METRICS.histogram("pipeline_seconds", "Pipeline wall time", ["status"])
+
+class PipelineStep(BaseModel):
+    id: str
+    agent: str
+    after: List[str] = []
+    payload: Optional[Dict[str, Any]] = None
+
+class PipelineRequest(BaseModel):
+    steps: List[PipelineStep]
+    timeout: float = Field(30.0, gt=0, le=MAX_PIPELINE_TIMEOUT)
+
+app = FastAPI(title="Unified Agents Gateway", version="1.0", default_response_class=CodecJSONResponse)
+add_routes(app)
+
+for group in GROUPS:
+    app.mount(f"/{group}", make_group_app(group))
+
+@app.on_event("shutdown")
+def _shutdown():
+    RUNNER.shutdown()
+
+@app.get("/health")
+def health():
+    return {"groups": {g: len(n) for g, n in GROUPS.items()}, "agents": len(ROUTES), "status": "ok"}
+
+@app.get("/agents")
+def agents():
+    return {"routes": ROUTES, "loaded": REGISTRY.stats(), "cache": CACHE.stats(), "limits": RUNNER.stats()}
+
+@app.post("/agent/{name}")
+async def run_agent(name: str, req: RunRequest, response: Response, cache: CacheMode = "use"):
+    if name not in ROUTES:
+        raise HTTPException(status_code=404, detail=f"Unknown agent {name}")
+    return await invoke(name, req.payload, response, cache)
+
+@app.post("/pipeline")
+async def pipeline(req: PipelineRequest, cache: CacheMode = "use"):
+    steps = [Step(s.id, s.agent, s.after, s.payload) for s in req.steps]
+    try:
+        validate(steps, ROUTES, MAX_PIPELINE_STEPS)
+    except PipelineError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    result = await run_pipeline(steps, lambda agent, payload: call_agent(agent, payload, cache), req.timeout)
+    PIPELINE_SECONDS.labels(result["status"]).observe(result["elapsed_ms"] / 1000)
+    return result
+
+@app.delete("/cache")
+def invalidate_all():
+    return {"invalidated": CACHE.invalidate()}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
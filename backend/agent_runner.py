@@ -0,0 +1,75 @@
+"""Bounded execution of agent callables for the async gateways.
+
+Coroutine agents are awaited on the event loop; plain functions run on a
+dedicated, bounded thread pool so a slow agent cannot starve the server's
+default threadpool.  Each agent has its own concurrency semaphore and a
+bounded wait queue: a full queue fails fast with 429, a wait that outlasts
+``queue_timeout`` fails with 503.
+"""
+import asyncio, inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class AgentOverloaded(Exception):
+    def __init__(self, agent: str, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.agent, self.status_code, self.detail, self.retry_after = agent, status_code, detail, retry_after
+
+class _Limiter:
+    __slots__ = ("sem", "concurrency", "max_queue", "queue_timeout", "active", "waiting")
+
+    def __init__(self, concurrency: int, max_queue: int, queue_timeout: float):
+        self.sem = asyncio.Semaphore(concurrency)
+        self.concurrency, self.max_queue, self.queue_timeout = concurrency, max_queue, queue_timeout
+        self.active = self.waiting = 0
+
+class AgentRunner:
+    def __init__(self, executor_workers: int = 16, default: Optional[dict] = None,
+                 agents: Optional[Dict[str, dict]] = None):
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="agent")
+        self.default = {"concurrency": 4, "max_queue": 32, "queue_timeout": 10.0, **(default or {})}
+        self.overrides = agents or {}
+        self._limiters: Dict[str, _Limiter] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "AgentRunner":
+        config = config or {}
+        return cls(config.get("executor_workers", 16), config.get("default"), config.get("agents"))
+
+    def _limiter(self, agent: str) -> _Limiter:
+        lim = self._limiters.get(agent)
+        if lim is None:
+            cfg = {**self.default, **self.overrides.get(agent, {})}
+            lim = self._limiters[agent] = _Limiter(cfg["concurrency"], cfg["max_queue"], cfg["queue_timeout"])
+        return lim
+
+    async def run(self, agent: str, fn: Callable[[Any], Any], payload: Any) -> Any:
+        lim = self._limiter(agent)
+        if lim.sem.locked():
+            if lim.waiting >= lim.max_queue:
+                raise AgentOverloaded(agent, 429, f"agent {agent} queue is full ({lim.max_queue})")
+            lim.waiting += 1
+            try:
+                await asyncio.wait_for(lim.sem.acquire(), lim.queue_timeout)
+            except asyncio.TimeoutError:
+                raise AgentOverloaded(agent, 503, f"agent {agent} busy for {lim.queue_timeout}s",
+                                      retry_after=int(lim.queue_timeout) or 1) from None
+            finally:
+                lim.waiting -= 1
+        else:
+            await lim.sem.acquire()
+        lim.active += 1
+        try:
+            if inspect.iscoroutinefunction(fn):
+                return await fn(payload)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, payload)
+        finally:
+            lim.active -= 1
+            lim.sem.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {a: {"active": l.active, "waiting": l.waiting, "concurrency": l.concurrency,
+                    "max_queue": l.max_queue} for a, l in self._limiters.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,118 @@
+"""Agent registry: resolves each agent's ``run``/``main`` callable once.
+
+Resolved callables and failures are cached per agent.  The module file is
+re-checked at most every ``check_interval`` seconds and only re-imported
+when its content hash changes, so the request path is a dict lookup at
+steady state.  Agents without a callable (or that fail to import) get a
+cached echo stub, as before.  Names without a module file also get the
+stub but are not cached, so made-up names leave nothing behind.
+"""
+import hashlib, importlib, pathlib, sys, threading, time, traceback
 from importlib import import_module
+from typing import Any, Callable, Dict, Optional
+
+AGENTS_DIR = pathlib.Path(__file__).resolve().parent
+
+def _stub_for(name: str) -> Callable:
+    def _stub(payload): return {"agent": name, "status": "ok", "echo": payload}
+    return _stub
+
+class AgentEntry:
+    __slots__ = ("name", "fn", "mtime_ns", "digest", "load_ms", "loads", "error", "loaded_at", "checked")
+
+    def __init__(self, name: str):
+        self.name, self.fn = name, _stub_for(name)
+        self.mtime_ns: Optional[int] = None
+        self.digest: Optional[str] = None
+        self.load_ms, self.loads, self.error = 0.0, 0, None
+        self.loaded_at, self.checked = 0.0, 0.0
+
+    def info(self) -> Dict[str, Any]:
+        return {"agent": self.name, "callable": getattr(self.fn, "__name__", None),
+                "stub": self.fn.__name__ == "_stub", "load_ms": round(self.load_ms, 3),
+                "loads": self.loads, "error": self.error, "loaded_at": self.loaded_at,
+                "digest": self.digest}
+
+class AgentRegistry:
+    def __init__(self, package: str = __name__, directory: pathlib.Path = AGENTS_DIR,
+                 check_interval: float = 1.0):
+        self.package, self.directory, self.check_interval = package, directory, check_interval
+        self._entries: Dict[str, AgentEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Callable:
+        return self.entry(name).fn
+
+    def entry(self, name: str) -> AgentEntry:
+        e = self._entries.get(name)
+        if e is not None and time.monotonic() - e.checked < self.check_interval:
+            return e
+        with self._lock:
+            return self._refresh(name)
+
+    def exists(self, name: str) -> bool:
+        """True if ``name`` has a module file in the agents directory"""
+        return name.isidentifier() and (self.directory / f"{name}.py").is_file()
+
+    def _miss(self, name: str, error: str) -> AgentEntry:
+        """An unpublished stub entry: unknown names are not kept in ``_entries``"""
+        self._entries.pop(name, None)
+        e = AgentEntry(name)
+        e.error = error
+        return e
+
+    def _refresh(self, name: str) -> AgentEntry:
+        # lock held; a new entry is published only once it has loaded, so the
+        # unlocked fast path in entry() never sees a half-initialised one
+        e = self._entries.get(name)
+        if e is not None and time.monotonic() - e.checked < self.check_interval:
+            return e  # another caller refreshed it while we waited
+        if not name.isidentifier():
+            return self._miss(name, "invalid agent name")
+        path = self.directory / f"{name}.py"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return self._miss(name, "module not found")
+        if e is None:
+            e = AgentEntry(name)
+        if mtime != e.mtime_ns:
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()
+            e.mtime_ns = mtime
+            if digest != e.digest:  # else touched, not changed
+                e.digest = digest
+                self._load(e)
+        e.checked = time.monotonic()
+        self._entries[name] = e
+        return e
+
+    def _load(self, e: AgentEntry):
+        modname = f"{self.package}.{e.name}"
+        t0 = time.perf_counter()
+        try:
+            mod = sys.modules.get(modname)
+            mod = importlib.reload(mod) if mod is not None else import_module(modname)
+            fn = getattr(mod, "run", None) or getattr(mod, "main", None)
+            e.error = None if fn is not None else "no run/main callable"
+        except Exception as exc:
+            fn = None
+            e.error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        e.fn = fn or _stub_for(e.name)
+        e.load_ms = (time.perf_counter() - t0) * 1000
+        e.loads += 1
+        e.loaded_at = time.time()
+
+    def invalidate(self, name: Optional[str] = None):
+        """Force a re-check (and re-import) on next use."""
+        with self._lock:
+            entries = self._entries.values() if name is None else filter(None, [self._entries.get(name)])
+            for e in entries:
+                e.checked, e.mtime_ns, e.digest = 0.0, None, None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: e.info() for name, e in self._entries.items()}
+
+REGISTRY = AgentRegistry()
+
 def load_agent(name: str):
-    try:
-        mod = import_module(f"backend.agents.{name}")
-        fn = getattr(mod, "run", None) or getattr(mod, "main", None)
-    except Exception:
-        fn = None
-    if fn is None:
-        def _stub(payload): return {"agent": name, "status": "ok", "echo": payload}
-        return _stub
-    return fn
+    return REGISTRY.get(name)
@@ -0,0 +1,77 @@
+"""Record and response serialization.
+
+``dumps`` writes compact, canonical JSON (no whitespace, sorted keys) using
+``orjson`` when it is installed and the stdlib ``json`` module otherwise; the
+two produce interchangeable output.  ``MsgpackCodec`` is an optional compact
+binary format (requires ``msgpack``) for WhisperSync storage.  Binary records
+start with ``BINARY_TAG``, a byte that never begins JSON text or a msgpack
+value, so ``decode`` tells the formats apart and old indented JSON still loads.
+"""
+import json
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+BINARY_TAG = b"\xc1"   # reserved ("never used") in msgpack; not valid JSON
+
+def _default(obj: Any) -> str:
+    # dates as orjson renders them, so both encoders agree
+    return obj.isoformat() if hasattr(obj, "isoformat") else str(obj)
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                      default=_default).encode("utf-8")
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=str, option=_ORJSON_OPTS)
+        except TypeError:  # e.g. integers wider than 64 bits
+            return _stdlib_dumps(obj)
+
+    loads = orjson.loads
+else:
+    dumps = _stdlib_dumps
+    loads = json.loads
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, obj: Any) -> bytes:
+        return dumps(obj)
+
+    def decode(self, raw: bytes) -> Any:
+        return decode(raw)
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack  # optional dependency, only needed to write binary records
+        self._packb = msgpack.packb
+
+    def encode(self, obj: Any) -> bytes:
+        return BINARY_TAG + self._packb(obj, use_bin_type=True, default=str)
+
+    def decode(self, raw: bytes) -> Any:
+        return decode(raw)
+
+CODECS: Dict[str, type] = {"json": JsonCodec, "msgpack": MsgpackCodec}
+
+def get_codec(name: str = "json"):
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"unknown codec {name!r} (expected one of {', '.join(CODECS)})") from None
+
+def decode(raw: bytes) -> Any:
+    """Decode a record written by any codec."""
+    if raw[:1] == BINARY_TAG:
+        import msgpack
+        return msgpack.unpackb(raw[1:], raw=False)
+    return loads(raw)
@@ -0,0 +1,293 @@
+"""Process-wide metrics in the Prometheus text format, plus a sampling profiler.
+
+Counters, gauges and histograms keep one slot array per thread, created the
+first time a thread touches a metric, so recording is a thread-local lookup
+and an in-place add: no lock and no allocation on the hot path.  The per-thread
+slots are summed when ``REGISTRY.render()`` is scraped; a thread's slots are
+folded into a shared base when it exits, so thread churn does not grow them.  Gauges can instead be
+computed at scrape time from a callback (``fn``), which costs nothing between
+scrapes.  Label children are cached; hot callers may keep the child returned
+by ``labels(...)`` to skip even the cache lookup.
+
+``add_routes(app)`` serves ``GET /metrics`` on a FastAPI app.  With
+``METRICS_PROFILING=1`` it also adds ``/debug/profile`` endpoints that start and
+stop ``PROFILER`` at runtime and return folded stacks (flamegraph input).
+"""
+import os, sys, threading, time, weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Owner:
+    """Lives in a thread's local storage; collected when the thread exits."""
+    __slots__ = ("__weakref__",)
+
+class _Sharded:
+    """Per-thread slot arrays, summed on read."""
+    __slots__ = ("_local", "_shards", "_base", "_width", "_lock")
+
+    def __init__(self, width: int):
+        self._local, self._shards, self._width = threading.local(), {}, width
+        self._base = [0] * width        # slots of threads that have exited
+        self._lock = threading.Lock()
+
+    def _shard(self) -> list:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard, owner = [0] * self._width, _Owner()
+            with self._lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(owner, self._retire, shard)
+            self._local.shard, self._local.owner = shard, owner
+            return shard
+
+    def _retire(self, shard: list):
+        with self._lock:
+            del self._shards[id(shard)]
+            self._base = [a + b for a, b in zip(self._base, shard)]
+
+    def _totals(self) -> list:
+        with self._lock:
+            shards = [self._base, *self._shards.values()]
+        return [sum(col) for col in zip(*shards)]
+
+class CounterChild(_Sharded):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        self._shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+
+class GaugeChild(CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self._shard()[0] -= amount
+
+class HistogramChild(_Sharded):
+    __slots__ = ("bounds",)
+
+    def __init__(self, bounds: Sequence[float]):
+        super().__init__(len(bounds) + 2)   # buckets, +Inf, sum
+        self.bounds = bounds
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        totals = self._totals()
+        return totals[:-1], totals[-1]
+
+class Metric:
+    """A named family of label children."""
+
+    def __init__(self, kind: str, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, fn: Optional[Callable] = None):
+        self.kind, self.name, self.help = kind, name, help
+        self.labelnames, self.buckets, self.fn = tuple(labelnames), tuple(buckets), fn
+        self._children: Dict[tuple, _Sharded] = {}
+        self._lock = threading.Lock()
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_child(self):
+        if self.kind == "counter":
+            return CounterChild()
+        if self.kind == "gauge":
+            return GaugeChild()
+        return HistogramChild(self.buckets)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    # unlabelled shortcuts
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        if self.fn is not None:
+            value = self.fn()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            for key, v in items:
+                key = key if isinstance(key, tuple) else (key,)
+                yield self.name, dict(zip(self.labelnames, map(str, key))), v
+            return
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.labelnames, key))
+            if self.kind != "histogram":
+                yield self.name, labels, child.value
+                continue
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield self.name + "_bucket", {**labels, "le": _fmt(bound)}, cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind: str, name: str, help: str, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(kind, name, help, **kwargs)
+            elif kwargs.get("fn") is not None:
+                metric.fn = kwargs["fn"]   # newest owner wins (e.g. a reopened WhisperSync)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register("counter", name, help, labelnames=labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Optional[Callable] = None) -> Metric:
+        """``fn`` returns the value, or a dict of label value(s) -> value, at scrape time"""
+        return self._register("gauge", name, help, labelnames=labelnames, fn=fn)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Metric:
+        return self._register("histogram", name, help, labelnames=labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            try:
+                samples = list(m.samples())
+            except Exception:  # a failing gauge callback must not break the scrape
+                continue
+            for name, labels, value in samples:
+                if labels:
+                    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                    lines.append(f"{name}{{{body}}} {_fmt(value)}")
+                else:
+                    lines.append(f"{name} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class SamplingProfiler:
+    """Samples every thread's stack each ``interval`` seconds from a background
+    thread and counts identical stacks; nothing runs in the sampled threads."""
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.interval = 0.005
+        self.samples = 0
+        self.started: Optional[float] = None
+        self._stacks: Dict[str, int] = {}
+        self._lock = threading.Lock()      # the sampler inserts while folded() reads
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005) -> bool:
+        """Start sampling with fresh counts; False if already running"""
+        if self.running:
+            return False
+        with self._lock:
+            self.interval, self.samples, self._stacks = max(interval, 0.0005), 0, {}
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> str:
+        """Stop sampling and return the folded stacks"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.folded()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            keys = []
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                keys.append(";".join(reversed(stack)))
+            with self._lock:
+                for key in keys:
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def folded(self, top: Optional[int] = None) -> str:
+        """``frame;frame;frame count`` lines, most frequent first"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        stacks = sorted(stacks, key=lambda kv: kv[1], reverse=True)[:top]
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+PROFILER = SamplingProfiler()
+
+def add_routes(app):
+    """``GET /metrics`` and, with METRICS_PROFILING=1, ``/debug/profile``."""
+    from fastapi.responses import PlainTextResponse
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    if os.getenv("METRICS_PROFILING", "0") != "1":
+        return
+
+    @app.post("/debug/profile/start")
+    def profile_start(interval: float = 0.005):
+        return {"started": PROFILER.start(interval), "interval": PROFILER.interval}
+
+    @app.post("/debug/profile/stop", response_class=PlainTextResponse)
+    def profile_stop():
+        return PlainTextResponse(PROFILER.stop())
+
+    @app.get("/debug/profile", response_class=PlainTextResponse)
+    def profile(top: int = 200):
+        return PlainTextResponse(PROFILER.folded(top))
@@ -0,0 +1,119 @@
+"""In-process execution of a DAG of agent steps.
+
+A pipeline is a list of steps, each naming an agent and the steps it runs
+``after``.  Every step starts as soon as its dependencies have finished, so
+independent branches run concurrently; results are handed to the next step as
+Python objects, never re-serialized between steps.
+
+A step's payload is built from its dependencies:
+
+* no dependencies: the step's own ``payload``;
+* one dependency and no ``payload`` of its own: that step's result, as is
+  (so ``Sun -> Mercury -> Earth`` is a plain chain);
+* otherwise: ``payload`` plus ``"inputs": {step id: result, ...}``.
+
+A failed step fails its dependents (status ``skipped``) but not unrelated
+branches.  ``run_pipeline`` returns every step's result with its status,
+start offset and duration.
+"""
+import asyncio, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+Call = Callable[[str, Any], Awaitable[Tuple[Any, str]]]   # (agent, payload) -> (result, cache status)
+
+class PipelineError(ValueError):
+    """The step graph is invalid (duplicate id, unknown dependency, cycle, ...)."""
+
+class Step:
+    __slots__ = ("id", "agent", "after", "payload")
+
+    def __init__(self, id: str, agent: str, after: Sequence[str] = (), payload: Optional[Dict[str, Any]] = None):
+        self.id, self.agent, self.after, self.payload = id, agent, tuple(after), payload
+
+def validate(steps: Sequence[Step], agents: Optional[Sequence[str]] = None, max_steps: int = 64) -> List[Step]:
+    """Check the graph and return the steps in a topological order."""
+    if not steps:
+        raise PipelineError("pipeline has no steps")
+    if len(steps) > max_steps:
+        raise PipelineError(f"pipeline has {len(steps)} steps, limit is {max_steps}")
+    by_id: Dict[str, Step] = {}
+    for step in steps:
+        if step.id in by_id:
+            raise PipelineError(f"duplicate step id {step.id!r}")
+        if agents is not None and step.agent not in agents:
+            raise PipelineError(f"step {step.id!r}: unknown agent {step.agent!r}")
+        by_id[step.id] = step
+    for step in steps:
+        for dep in step.after:
+            if dep not in by_id:
+                raise PipelineError(f"step {step.id!r} runs after unknown step {dep!r}")
+    pending = {s.id: len(set(s.after)) for s in steps}
+    children: Dict[str, List[str]] = {s.id: [] for s in steps}
+    for step in steps:
+        for dep in set(step.after):
+            children[dep].append(step.id)
+    ready = [s.id for s in steps if not pending[s.id]]
+    order = []
+    while ready:
+        step_id = ready.pop()
+        order.append(by_id[step_id])
+        for child in children[step_id]:
+            pending[child] -= 1
+            if not pending[child]:
+                ready.append(child)
+    if len(order) != len(steps):
+        cyclic = sorted(s for s, n in pending.items() if n)
+        raise PipelineError(f"steps {', '.join(cyclic)} form a cycle")
+    return order
+
+def step_payload(step: Step, results: Dict[str, Any]) -> Any:
+    if not step.after:
+        return step.payload if step.payload is not None else {}
+    if len(step.after) == 1 and step.payload is None:
+        return results[step.after[0]]
+    return {**(step.payload or {}), "inputs": {dep: results[dep] for dep in step.after}}
+
+async def run_pipeline(steps: Sequence[Step], call: Call, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Run validated ``steps``; a pipeline over ``timeout`` cancels what is still running."""
+    t0 = time.perf_counter()
+    results: Dict[str, Any] = {}
+    info: Dict[str, Dict[str, Any]] = {s.id: {"agent": s.agent, "status": "pending"} for s in steps}
+    done: Dict[str, asyncio.Future] = {s.id: asyncio.get_running_loop().create_future() for s in steps}
+
+    async def run_step(step: Step) -> None:
+        meta = info[step.id]
+        try:
+            ok = [await done[dep] for dep in step.after]
+            if not all(ok):
+                meta["status"] = "skipped"
+                return
+            meta["status"] = "running"
+            started = time.perf_counter()
+            meta["start_ms"] = round((started - t0) * 1000, 3)
+            try:
+                result, meta["cache"] = await call(step.agent, step_payload(step, results))
+            except Exception as e:
+                meta["status"], meta["error"] = "error", getattr(e, "detail", None) or repr(e)
+            else:
+                results[step.id], meta["status"] = result, "ok"
+            meta["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        finally:
+            if not done[step.id].done():
+                done[step.id].set_result(meta["status"] == "ok")
+
+    tasks = [asyncio.ensure_future(run_step(step)) for step in steps]
+    _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+    for task in unfinished:
+        task.cancel()
+    if unfinished:
+        await asyncio.wait(unfinished)
+        for meta in info.values():
+            if meta["status"] in ("pending", "running"):
+                meta["status"] = "timeout"
+    statuses = {meta["status"] for meta in info.values()}
+    return {
+        "status": "ok" if statuses == {"ok"} else "error",
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "steps": info,
+        "results": results
+    }
@@ -0,0 +1,8 @@
+"""FastAPI response class that renders through ``backend.codec``."""
+from typing import Any
+from fastapi.responses import JSONResponse
+from backend import codec
+
+class CodecJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return codec.dumps(content)
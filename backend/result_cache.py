@@ -0,0 +1,99 @@
+"""Opt-in, payload-keyed result cache for agent calls.
+
+Entries are keyed on (agent, sha256 of the canonical JSON payload), evicted
+LRU past ``max_entries`` and expired after the agent's TTL.  Concurrent
+identical calls are coalesced: one caller runs the agent, the rest wait for
+its result.  Only agents with a configured TTL are cached.  ``acall`` is for
+coroutines on one event loop; the shared run is its own task, so a caller that
+is cancelled (a client disconnect) does not cancel it for the others, and it
+is only cancelled once nobody is waiting on it.
+"""
+import asyncio, hashlib, threading, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from backend import codec
+
+def payload_key(agent: str, payload: Any) -> Tuple[str, str]:
+    return agent, hashlib.sha256(codec.dumps(payload)).hexdigest()
+
+class ResultCache:
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 1024):
+        self.ttls, self.max_entries = dict(ttls), max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._waiters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "ResultCache":
+        config = config or {}
+        return cls(config.get("agents", {}), config.get("max_entries", 1024))
+
+    def enabled(self, agent: str) -> bool:
+        return self.ttls.get(agent, 0) > 0
+
+    async def acall(self, agent: str, payload: Any, run: Callable[[Any], Awaitable[Any]],
+                    mode: str = "use") -> Tuple[Any, str]:
+        """Await ``run(payload)`` through the cache; returns (result, hit|miss|coalesced|bypass|off)."""
+        if not self.enabled(agent):
+            return await run(payload), "off"
+        if mode == "bypass":
+            return await run(payload), "bypass"
+        key = payload_key(agent, payload)
+        if mode == "use":
+            with self._lock:
+                hit = self._lookup(key)
+            if hit is not None:
+                return hit[1], "hit"
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._lead(key, run, payload))
+            task.add_done_callback(lambda t: self._pending.get(key) is t and self._pending.pop(key))
+            self.misses += 1
+            status = "miss"
+        else:
+            self.coalesced += 1
+            status = "coalesced"
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task), status
+        finally:
+            left = self._waiters[key] = self._waiters[key] - 1
+            if not left:
+                del self._waiters[key]
+                if not task.done():
+                    task.cancel()
+
+    async def _lead(self, key, run, payload):
+        result = await run(payload)
+        with self._lock:
+            self._store(key, result)
+        return result
+
+    def _lookup(self, key):
+        hit = self._entries.get(key)
+        if hit is None or hit[0] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return hit
+
+    def _store(self, key, result):
+        self._entries[key] = (time.monotonic() + self.ttls[key[0]], result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, agent: Optional[str] = None, payload: Any = None) -> int:
+        with self._lock:
+            if agent is not None and payload is not None:
+                return 1 if self._entries.pop(payload_key(agent, payload), None) else 0
+            keys = [k for k in self._entries if agent is None or k[0] == agent]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "inflight": len(self._pending),
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
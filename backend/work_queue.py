@@ -0,0 +1,183 @@
+"""Bounded in-process work queue for the threaded (Flask) gateway.
+
+``submit`` resolves the agent through ``backend.agents.load_agent`` and
+either runs it right away (the fast path) or queues it for a fixed set of
+worker threads.  The fast path is taken for agents whose recent run time (an
+EWMA) is under ``sync_seconds``; an agent without history always goes
+through the queue first.  Fast-path jobs run on a small separate pool of
+``inline_workers`` threads (when all are busy the job is queued instead) and
+the caller waits at most ``inline_timeout`` for them, so an agent that turns
+slow costs a request thread no more than that.  Set ``sync_seconds`` to 0 to
+queue everything.  Names without a module in ``backend/agents`` are refused
+before anything is queued or timed.
+
+A full queue raises ``QueueFull`` with a Retry-After estimate instead of
+blocking the request thread.  Finished jobs stay queryable for ``ttl``
+seconds and at most ``max_jobs`` are kept, oldest evicted first.
+"""
+import itertools, math, os, queue, threading, time, traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from backend.agents import REGISTRY, load_agent
+
+FINISHED = ("done", "error")
+
+class QueueFull(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail, self.retry_after = detail, retry_after
+
+class UnknownAgent(ValueError):
+    pass
+
+class WorkJob:
+    __slots__ = ("id", "agent", "payload", "status", "result", "error", "created", "started", "finished",
+                 "inline", "_event")
+
+    def __init__(self, job_id: str, agent: str, payload: Any):
+        self.id, self.agent, self.payload = job_id, agent, payload
+        self.status, self.result, self.error = "queued", None, None
+        self.created, self.started, self.finished = time.time(), None, None
+        self.inline = False
+        self._event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"job_id": self.id, "agent": self.agent, "status": self.status, "created": self.created,
+               "started": self.started, "finished": self.finished, "inline": self.inline}
+        if self.started is not None:
+            out["queue_seconds"] = round(self.started - self.created, 6)
+        if self.finished is not None and self.started is not None:
+            out["run_seconds"] = round(self.finished - self.started, 6)
+        if self.status == "done":
+            out["result"] = self.result
+        elif self.status == "error":
+            out["error"] = self.error
+        return out
+
+class WorkQueue:
+    def __init__(self, workers: int = 4, max_queue: int = 256, sync_seconds: float = 0.05,
+                 ttl: float = 600, max_jobs: int = 10000, inline_workers: int = 4, inline_timeout: float = 0.5):
+        self.workers, self.sync_seconds, self.ttl, self.max_jobs = max(1, workers), sync_seconds, ttl, max_jobs
+        self.inline_timeout = inline_timeout
+        self._inline = ThreadPoolExecutor(max_workers=max(1, inline_workers), thread_name_prefix="work-inline")
+        self._inline_slots = threading.BoundedSemaphore(max(1, inline_workers))
+        self._queue: "queue.Queue[Optional[WorkJob]]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, WorkJob] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()   # job id -> finish time, in order
+        self._avg: Dict[str, float] = {}      # agent -> EWMA run seconds
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}{int(time.time()):x}"
+        self.running = 0
+        self._threads = [threading.Thread(target=self._work, name=f"work-queue-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    @classmethod
+    def from_env(cls) -> "WorkQueue":
+        return cls(workers=int(os.getenv("FLASK_GATEWAY_WORKERS", "4")),
+                   max_queue=int(os.getenv("FLASK_GATEWAY_QUEUE_SIZE", "256")),
+                   sync_seconds=float(os.getenv("FLASK_GATEWAY_SYNC_MS", "50")) / 1000,
+                   ttl=float(os.getenv("FLASK_GATEWAY_JOB_TTL", "600")),
+                   max_jobs=int(os.getenv("FLASK_GATEWAY_MAX_JOBS", "10000")),
+                   inline_workers=int(os.getenv("FLASK_GATEWAY_INLINE_WORKERS", "4")),
+                   inline_timeout=float(os.getenv("FLASK_GATEWAY_INLINE_TIMEOUT_MS", "500")) / 1000)
+
+    def retry_after(self) -> int:
+        avg = sum(self._avg.values()) / len(self._avg) if self._avg else 1.0
+        return max(1, min(60, math.ceil(self._queue.qsize() / self.workers * avg)))
+
+    def submit(self, agent: str, payload: Any) -> WorkJob:
+        """
+        Run ``agent`` on the fast path if it is known to be fast, else queue it
+
+        Fast-path jobs are waited for up to ``inline_timeout``; check ``done``.
+        Raises UnknownAgent, or QueueFull when the job had to be queued.
+        """
+        if not REGISTRY.exists(agent):
+            raise UnknownAgent(f"unknown agent {agent!r}")
+        job = WorkJob(f"{self._prefix}-{next(self._ids):x}", agent, payload)
+        avg = self._avg.get(agent)
+        inline = avg is not None and avg < self.sync_seconds and self._inline_slots.acquire(blocking=False)
+        with self._lock:
+            self._evict()
+            if not inline:
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    raise QueueFull(f"work queue is full ({self._queue.maxsize})", self.retry_after()) from None
+            self._jobs[job.id] = job
+        if inline:
+            job.inline = True
+            self._inline.submit(self._run_inline, job)
+            job.wait(self.inline_timeout)
+        return job
+
+    def _run_inline(self, job: WorkJob):
+        try:
+            self._execute(job)
+        finally:
+            self._inline_slots.release()
+
+    def get(self, job_id: str) -> Optional[WorkJob]:
+        return self._jobs.get(job_id)
+
+    def _execute(self, job: WorkJob):
+        job.status, job.started = "running", time.time()
+        with self._lock:
+            self.running += 1
+        started = time.perf_counter()
+        try:
+            job.result = load_agent(job.agent)(job.payload)
+            job.status = "done"
+        except Exception as e:
+            job.status, job.error = "error", "".join(traceback.format_exception_only(type(e), e)).strip()
+        finally:
+            elapsed = time.perf_counter() - started
+            prev = self._avg.get(job.agent)
+            self._avg[job.agent] = elapsed if prev is None else prev + 0.2 * (elapsed - prev)
+            job.finished = time.time()
+            job.payload = None
+            with self._lock:
+                self.running -= 1
+                self._finished[job.id] = job.finished
+            job._event.set()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._execute(job)
+
+    def _evict(self):
+        """Drop finished jobs past ``ttl``, or oldest-first past ``max_jobs`` (lock held)"""
+        cutoff = time.time() - self.ttl
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished > cutoff and len(self._jobs) <= self.max_jobs:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"queued": self._queue.qsize(), "running": self.running, "workers": self.workers,
+                    "max_queue": self._queue.maxsize, "jobs": len(self._jobs), "finished": len(self._finished),
+                    "sync_ms": self.sync_seconds * 1000,
+                    "avg_ms": {a: round(s * 1000, 3) for a, s in self._avg.items()}}
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._inline.shutdown(wait=False)
@@ -0,0 +1,118 @@
+"""Long-lived agent worker for gateway_py.pool.
+
+Runs backend/agents scripts in-process as ``__main__`` so each job skips the
+interpreter cold start.  Jobs arrive on stdin and results leave on stdout as
+frames: a JSON header line followed by ``size`` raw bytes.
+
+    request:  {"path": "...", "size": N}\\n <N body bytes>
+    response: {"out": N}\\n <N output bytes>   (zero or more, sent per 8 KiB
+                                              or every FLUSH_SECONDS while the
+                                              agent runs)
+              {"exit_code": C}\\n
+"""
+import io, json, os, pathlib, sys, threading, time, traceback
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+AGENTS = ROOT / "backend" / "agents"
+sys.path.insert(0, str(ROOT))
+
+FLUSH_SECONDS = 0.05  # streaming latency bound for agents that print a little and then work
+_CODE = {}  # path -> (mtime_ns, code object)
+
+def _code_for(path: str):
+    mtime = os.stat(path).st_mtime_ns
+    hit = _CODE.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with open(path, "rb") as f:
+        code = compile(f.read(), path, "exec")
+    _CODE[path] = (mtime, code)
+    return code
+
+def _preload():
+    import backend.agents  # noqa: F401  shared deps are imported once per worker
+    for p in sorted(AGENTS.glob("*.py")):
+        if p.name != "__init__.py":
+            try: _code_for(str(p))
+            except Exception: pass
+
+def _exit_code(e: SystemExit, err) -> int:
+    if e.code is None: return 0
+    if isinstance(e.code, int): return e.code
+    print(e.code, file=err)
+    return 1
+
+class _FrameWriter(io.RawIOBase):
+    def __init__(self, w): self.w = w
+    def writable(self): return True
+    def write(self, b):
+        _send(self.w, {"out": len(b)}, bytes(b))
+        return len(b)
+
+class _Flusher(threading.Thread):
+    """Flushes the running job's output buffer every ``FLUSH_SECONDS``"""
+
+    def __init__(self):
+        super().__init__(name="output-flusher", daemon=True)
+        self.lock, self.buffer = threading.Lock(), None
+
+    def run(self):
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            with self.lock:
+                if self.buffer is not None:
+                    try: self.buffer.flush()
+                    except (OSError, ValueError): pass
+
+    def attach(self, buffer):
+        with self.lock:
+            self.buffer = buffer
+
+_FLUSHER = _Flusher()
+
+def run_job(path: str, body: bytes, w):
+    # no line buffering: a frame per printed line made chatty agents slower than a
+    # plain spawn.  Text goes straight through to the (thread-safe) 8 KiB buffer,
+    # which is sent when full, by _FLUSHER, and at the end of the job.
+    buffer = io.BufferedWriter(_FrameWriter(w), 8192)
+    out = io.TextIOWrapper(buffer, encoding="utf-8", errors="replace", write_through=True)
+    saved = sys.stdin, sys.stdout, sys.stderr, sys.argv
+    sys.stdin = io.TextIOWrapper(io.BytesIO(body), encoding="utf-8")
+    sys.stdout = sys.stderr = out  # same as spawn mode's stderr=STDOUT
+    sys.argv = [path]
+    code = 0
+    _FLUSHER.attach(buffer)
+    try:
+        exec(_code_for(path), {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__})
+    except SystemExit as e:
+        code = _exit_code(e, out)
+    except BaseException:
+        traceback.print_exc(file=out); code = 1
+    finally:
+        _FLUSHER.attach(None)  # the timer must not send after the exit frame
+        out.flush()
+        sys.stdin, sys.stdout, sys.stderr, sys.argv = saved
+    return code
+
+def _send(w, header: dict, data: bytes = b""):
+    w.write(json.dumps(header).encode() + b"\n" + data)
+    w.flush()
+
+def main():
+    # Keep the protocol pipes private: anything an agent writes straight to
+    # fd 0/1 (os.write, child processes) must not corrupt the frames.
+    r = os.fdopen(os.dup(0), "rb"); w = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0); os.dup2(2, 1)
+    _preload()
+    _FLUSHER.start()
+    _send(w, {"ready": True, "pid": os.getpid()})
+    while True:
+        line = r.readline()
+        if not line: return
+        req = json.loads(line)
+        body = r.read(req["size"]) if req["size"] else b""
+        _send(w, {"exit_code": run_job(req["path"], body, w)})
+
+if __name__ == "__main__":
+    main()
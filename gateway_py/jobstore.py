@@ -0,0 +1,223 @@
+"""Memory-bounded job table for gateway_py.
+
+Finished jobs are evicted after ``ttl`` seconds, or oldest-finished-first once
+the table holds more than ``max_jobs``.  A batch is evicted once every one of
+its jobs has finished and been evicted.  Each job keeps only the last
+``output_cap`` bytes of stdout in memory; anything longer is spilled in full to
+``spill_dir/<job_id>.out``.
+"""
+import asyncio, itertools, os, pathlib, time
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+FINISHED = ("done", "error", "timeout")
+
+class OutputBuffer:
+    __slots__ = ("cap", "tail", "size", "spill_path", "spill_all", "_spill")
+
+    def __init__(self, cap: int, spill_path: pathlib.Path, spill_all: bool = False):
+        self.cap, self.tail, self.size = cap, bytearray(), 0
+        self.spill_path, self.spill_all, self._spill = spill_path, spill_all, None
+
+    def write(self, data: bytes):
+        if not data: return
+        if self._spill is None and (self.spill_all or self.size + len(data) > self.cap):
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill = open(self.spill_path, "wb")
+            self._spill.write(self.tail)  # still the complete output so far
+        if self._spill is not None:
+            self._spill.write(data)
+            self._spill.flush()  # streaming readers catch up from the file
+        self.size += len(data)
+        self.tail += data
+        if len(self.tail) > self.cap:
+            del self.tail[:len(self.tail) - self.cap]
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > len(self.tail)
+
+    def read_from(self, pos: int, limit: int = 64 * 1024) -> bytes:
+        """Bytes from absolute offset ``pos``; falls back to the spill file
+        when ``pos`` has already rotated out of the in-memory tail."""
+        start = self.size - len(self.tail)
+        if pos >= start:
+            return bytes(self.tail[pos - start:pos - start + limit])
+        with open(self.spill_path, "rb") as f:
+            f.seek(pos)
+            return f.read(limit)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+
+    def discard(self):
+        self.close()
+        if self._spill is not None or self.spill_all:
+            try: os.remove(self.spill_path)
+            except OSError: pass
+
+class Job:
+    __slots__ = ("id", "agent", "status", "priority", "exit_code", "stderr", "created", "started", "finished",
+                 "output", "_changed")
+
+    def __init__(self, job_id: str, agent: str, output: OutputBuffer, priority: str = "normal"):
+        self.id, self.agent, self.status, self.priority = job_id, agent, "queued", priority
+        self.exit_code, self.stderr = None, ""
+        self.created, self.started, self.finished = time.time(), None, None
+        self.output = output
+        self._changed: Optional[asyncio.Event] = None  # only allocated while someone waits
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def write(self, data: bytes):
+        self.output.write(data)
+        self.notify()
+
+    def notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def wait_changed(self, timeout: float) -> bool:
+        """Wait for new output or completion; False on timeout."""
+        if self.done: return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_done(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not self.done:
+            left = deadline - time.monotonic()
+            if left <= 0 or not await self.wait_changed(left):
+                return
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        end = self.started or self.finished  # never-started jobs waited until they failed
+        return round(end - self.created, 6) if end else None
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        return round(self.finished - self.started, 6) if self.started and self.finished else None
+
+    def summary(self) -> dict:
+        return {"id": self.id, "agent": self.agent, "status": self.status, "priority": self.priority,
+                "exit_code": self.exit_code, "created": self.created, "started": self.started,
+                "finished": self.finished, "queue_seconds": self.queue_seconds,
+                "run_seconds": self.run_seconds, "stdout_bytes": self.output.size}
+
+    def to_dict(self) -> dict:
+        d = self.summary()
+        d.update(stdout=self.output.tail.decode("utf-8", "ignore"), stderr=self.stderr,
+                 stdout_truncated=self.output.truncated)
+        if self.output.truncated:
+            d["stdout_file"] = str(self.output.spill_path)
+        return d
+
+class Batch:
+    __slots__ = ("id", "jobs", "concurrency", "created", "active")
+
+    def __init__(self, batch_id: str, jobs: List[Job], concurrency: int):
+        self.id, self.jobs, self.concurrency, self.created = batch_id, jobs, concurrency, time.time()
+        self.active = 0  # members running now, maintained by the scheduler
+
+    @property
+    def done(self) -> bool:
+        return all(j.done for j in self.jobs)
+
+    async def wait_done(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        for j in self.jobs:
+            await j.wait_done(max(0.0, deadline - time.monotonic()))
+
+    def to_dict(self) -> dict:
+        counts = {}
+        for j in self.jobs:
+            counts[j.status] = counts.get(j.status, 0) + 1
+        n = len(self.jobs)
+        if counts.get("queued") == n: status = "queued"
+        elif not self.done: status = "running"
+        else: status = "done" if counts.get("done") == n else "error"
+        return {"id": self.id, "status": status, "total": n, "counts": counts,
+                "concurrency": self.concurrency, "created": self.created,
+                "jobs": [j.summary() for j in self.jobs]}
+
+class JobStore:
+    def __init__(self, spill_dir: pathlib.Path, ttl: float = 3600, max_jobs: int = 10000,
+                 output_cap: int = 64 * 1024):
+        self.spill_dir, self.ttl, self.max_jobs, self.output_cap = spill_dir, ttl, max_jobs, output_cap
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # finish order
+        self._seq = itertools.count(1)
+        self._batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._batch_seq = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, root: pathlib.Path) -> "JobStore":
+        return cls(spill_dir=pathlib.Path(os.getenv("GATEWAY_SPILL_DIR", str(root / "logs" / "jobs"))),
+                   ttl=float(os.getenv("GATEWAY_JOB_TTL", "3600")),
+                   max_jobs=int(os.getenv("GATEWAY_MAX_JOBS", "10000")),
+                   output_cap=int(os.getenv("GATEWAY_OUTPUT_CAP", str(64 * 1024))))
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def create(self, agent: str, priority: str = "normal") -> Job:
+        job_id = str(next(self._seq))
+        job = Job(job_id, agent, OutputBuffer(self.output_cap, self.spill_dir / f"{job_id}.out"), priority)
+        self._jobs[job_id] = job
+        self.evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def create_batch(self, jobs: List[Job], concurrency: int) -> Batch:
+        batch = Batch(f"b{next(self._batch_seq)}", jobs, concurrency)
+        self._batches[batch.id] = batch
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        return self._batches.get(batch_id)
+
+    def start(self, job: Job):
+        job.status, job.started = "running", time.time()
+
+    def finish(self, job: Job, status: str, exit_code: Optional[int] = None, stderr: str = ""):
+        job.status, job.finished = status, time.time()
+        if exit_code is not None: job.exit_code = exit_code
+        if stderr: job.stderr = stderr
+        job.output.close()
+        self._finished[job.id] = job.finished
+        job.notify()
+
+    def evict(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        n = 0
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished > now - self.ttl and len(self._jobs) <= self.max_jobs:
+                break
+            del self._finished[job_id]
+            job = self._jobs.pop(job_id, None)
+            if job: job.output.discard()
+            n += 1
+        if n:  # a batch goes once all its members have finished and gone
+            for batch_id in [b.id for b in self._batches.values()
+                             if b.done and not any(j.id in self._jobs for j in b.jobs)]:
+                del self._batches[batch_id]
+        return n
+
+    def page(self, offset: int = 0, limit: int = 50, status: Optional[str] = None) -> Iterator[Job]:
+        jobs = iter(self._jobs.values())
+        if status:
+            jobs = (j for j in jobs if j.status == status)
+        return itertools.islice(jobs, offset, offset + limit)
@@ -1,54 +1,197 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import subprocess, asyncio, json, os, pathlib, time
-from typing import Dict
+import asyncio, codecs, os, pathlib, sys, time
+from typing import Any, List, Literal, Optional
 
-app = FastAPI(title="aikre8tive-gateway-py")
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from backend import codec
+from backend.metrics import REGISTRY, add_routes
+from backend.responses import CodecJSONResponse
+from gateway_py.jobstore import JobStore
+from gateway_py.pool import WorkerPool
+from gateway_py.scheduler import QueueFull, Scheduler
+from gateway_py.sqlite_jobstore import SqliteJobStore
+
+app = FastAPI(title="aikre8tive-gateway-py", default_response_class=CodecJSONResponse)
+
 AGENTS = ROOT / "backend" / "agents"
-JOBS: Dict[str, dict] = {}
-SEQ = 1
+JOB_TIMEOUT = 60
+MAX_WAIT = 60
+MAX_BATCH = 256
+JOBS = SqliteJobStore.from_env(ROOT) if os.getenv("GATEWAY_JOB_STORE") == "sqlite" else JobStore.from_env(ROOT)
+POOL = WorkerPool.from_env()
+
+Priority = Literal["high", "normal", "low"]
+
+JOBS_FINISHED = REGISTRY.counter("gateway_jobs_total", "Finished jobs by agent and final status", ["agent", "status"])
+JOB_SECONDS = REGISTRY.histogram("gateway_job_seconds", "Job run time from start to finish", ["agent"])
+QUEUE_SECONDS = REGISTRY.histogram("gateway_queue_seconds", "Time jobs waited for the scheduler", ["priority"])
+TIMEOUTS = REGISTRY.counter("gateway_timeouts_total", "Jobs killed after JOB_TIMEOUT", ["agent"])
+REJECTED = REGISTRY.counter("gateway_rejected_total", "Submissions refused with 429 because the queue was full")
+add_routes(app)
+
+@app.on_event("startup")
+async def _start_pool():
+    await POOL.start()
+
+@app.on_event("shutdown")
+async def _stop_pool():
+    await POOL.close()
 
 @app.get("/health")
 def health():
     return {"ok": True, "service":"aikre8tive-gateway-py"}
 
+def agent_path(agent: str) -> Optional[pathlib.Path]:
+    """The agent's script, or None unless ``agent`` names a file directly in AGENTS"""
+    if not agent.isidentifier():
+        return None
+    path = AGENTS / f"{agent}.py"
+    if not path.is_file() or path.resolve().parent != AGENTS.resolve():
+        return None
+    return path
+
+def _check_agents(agents: List[str]):
+    unknown = sorted({a for a in agents if agent_path(a) is None})
+    if unknown:
+        raise HTTPException(404, f"unknown agent(s): {', '.join(unknown)}")
+
+async def execute(job, body: bytes):
+    started = time.perf_counter()
+    label = job.agent  # only agents that exist become metric labels
+    try:
+        path = agent_path(job.agent)
+        if path is None:  # removed since the job was accepted
+            label = "unknown"
+            JOBS.finish(job, "error", stderr=f"Agent not found: {job.agent}")
+            return
+        JOBS.start(job)
+        QUEUE_SECONDS.labels(job.priority).observe(job.queue_seconds)
+        code = await POOL.run(job.agent, path, body, timeout=JOB_TIMEOUT, on_output=job.write)
+        JOBS.finish(job, "done" if code==0 else "error", exit_code=code)
+    except asyncio.TimeoutError:
+        TIMEOUTS.labels(label).inc()
+        JOBS.finish(job, "timeout", exit_code=124, stderr=f"agent execution timed out ({JOB_TIMEOUT}s)")
+    except Exception as e:
+        JOBS.finish(job, "error", stderr=str(e))
+    finally:
+        JOBS_FINISHED.labels(label, job.status).inc()
+        JOB_SECONDS.labels(label).observe(time.perf_counter() - started)
+
+SCHED = Scheduler.from_env(execute, default_running=POOL.size or (os.cpu_count() or 1))
+REGISTRY.gauge("gateway_jobs_queued", "Jobs waiting for the scheduler", fn=lambda: SCHED.queued)
+REGISTRY.gauge("gateway_jobs_running", "Jobs currently executing", fn=lambda: SCHED.running)
+
+def _reject(e: QueueFull):
+    REJECTED.inc()
+    raise HTTPException(429, e.detail, headers={"Retry-After": str(e.retry_after)})
+
+@app.get("/scheduler")
+def scheduler_stats():
+    return SCHED.stats()
+
 @app.post("/run/{agent}")
-async def run_agent(agent: str, request: Request):
-    global SEQ
+async def run_agent(agent: str, request: Request, priority: Priority = "normal"):
     body = await request.body()
     if not body:
         raise HTTPException(400, "empty body")
-    job_id = str(SEQ); SEQ += 1
-    JOBS[job_id] = {"status":"queued", "stdout":"", "stderr":"", "exit_code":None, "agent":agent}
-    async def worker():
-        try:
-            path = AGENTS / f"{agent}.py"
-            if not path.exists():
-                JOBS[job_id].update(status="error", stderr=f"Agent not found: {path}")
-                return
-            proc = await asyncio.create_subprocess_shell(
-                f'python3 "{path}"',
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT)
-            JOBS[job_id]["status"]="running"
-            out, _ = await asyncio.wait_for(proc.communicate(body), timeout=60)
-            JOBS[job_id]["stdout"]=out.decode("utf-8", "ignore")
-            JOBS[job_id]["exit_code"]=proc.returncode
-            JOBS[job_id]["status"]="done" if proc.returncode==0 else "error"
-        except asyncio.TimeoutError:
-            JOBS[job_id].update(status="timeout", exit_code=124, stderr="agent execution timed out (60s)")
-        except Exception as e:
-            JOBS[job_id].update(status="error", stderr=str(e))
-    asyncio.create_task(worker())
-    return {"job_id": job_id, "agent": agent, "status": "queued"}
+    _check_agents([agent])
+    try:
+        SCHED.check_room()
+    except QueueFull as e:
+        _reject(e)
+    job = JOBS.create(agent, priority)
+    SCHED.submit(job, body, priority)
+    return {"job_id": job.id, "agent": agent, "status": "queued", "priority": priority}
+
+class BatchItem(BaseModel):
+    agent: str
+    payload: Any = None
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchItem] = []
+    agents: List[str] = []      # fan one shared payload out to these agents
+    payload: Any = None
+    concurrency: int = 8
+    priority: Priority = "normal"
+
+def _encode(payload: Any) -> bytes:
+    if isinstance(payload, str): return payload.encode()
+    return codec.dumps({} if payload is None else payload)
+
+@app.post("/batch")
+async def run_batch(req: BatchRequest):
+    shared = _encode(req.payload)
+    items = [(i.agent, _encode(i.payload)) for i in req.jobs] + [(a, shared) for a in req.agents]
+    if not items:
+        raise HTTPException(400, "empty batch")
+    if len(items) > MAX_BATCH:
+        raise HTTPException(413, f"batch exceeds {MAX_BATCH} jobs")
+    _check_agents([agent for agent, _ in items])
+    try:
+        SCHED.check_room(len(items))  # all or nothing
+    except QueueFull as e:
+        _reject(e)
+    batch = JOBS.create_batch([JOBS.create(agent, req.priority) for agent, _ in items], max(1, req.concurrency))
+    for job, (_, body) in zip(batch.jobs, items):
+        SCHED.submit(job, body, req.priority, group=batch)
+    return {"batch_id": batch.id, "job_ids": [j.id for j in batch.jobs], "status": "queued"}
+
+@app.get("/batch/{batch_id}")
+async def get_batch(batch_id: str, wait: float = 0):
+    b = JOBS.get_batch(batch_id)
+    if not b: raise HTTPException(404, "not found")
+    if wait > 0:
+        await b.wait_done(min(wait, MAX_WAIT))
+    return b.to_dict()
+
+@app.get("/jobs")
+def list_jobs(offset: int = 0, limit: int = 50, status: Optional[str] = None):
+    limit = max(1, min(limit, 500))
+    return {"total": len(JOBS), "offset": offset, "limit": limit,
+            "jobs": [j.summary() for j in JOBS.page(offset, limit, status)]}
 
 @app.get("/jobs/{job_id}")
-def jobs(job_id: str):
+async def jobs(job_id: str, wait: float = 0):
+    j = JOBS.get(job_id)
+    if not j: raise HTTPException(404, "not found")
+    if wait > 0:
+        await j.wait_done(min(wait, MAX_WAIT))
+    return j.to_dict()
+
+def _sse(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    lines = "".join(f"data: {l}\n" for l in data.split("\n"))
+    return f"{head}event: {event}\n{lines}\n".encode()
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, request: Request):
+    """Server-Sent Events: ``output`` events while the agent runs, then ``end``.
+    Event ids are byte offsets, so a reconnect with Last-Event-ID resumes."""
     j = JOBS.get(job_id)
     if not j: raise HTTPException(404, "not found")
-    return {"id": job_id, **j}
+    try:  # anything but an offset we sent replays from the start
+        pos = max(0, int(request.headers.get("last-event-id") or 0))
+    except ValueError:
+        pos = 0
+    async def events():
+        nonlocal pos
+        decode = codecs.getincrementaldecoder("utf-8")("ignore").decode
+        while True:
+            done = j.done  # read before draining so no output is missed
+            while pos < j.output.size:
+                chunk = j.output.read_from(pos)
+                pos += len(chunk)
+                text = decode(chunk)
+                if text: yield _sse("output", text, pos)
+            if done: break
+            if not await j.wait_changed(15):
+                yield b": keep-alive\n\n"
+        yield _sse("end", codec.dumps(j.summary()).decode())
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 if __name__ == "__main__":
     import uvicorn
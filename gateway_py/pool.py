@@ -0,0 +1,173 @@
+"""Warm agent worker pool for gateway_py.
+
+Keeps ``size`` long-lived ``agent_worker.py`` processes around so a job costs
+one pipe round-trip instead of a shell fork plus interpreter start.  Workers
+are recycled after ``max_jobs`` jobs, killed and replaced on timeout, and
+agents listed in ``spawn_agents`` (or any job when the pool is disabled) run
+through the old one-process-per-job path.
+"""
+import asyncio, json, os, pathlib, sys, time
+from typing import Callable, Iterable, Optional
+from backend.metrics import REGISTRY
+
+WORKER = pathlib.Path(__file__).resolve().with_name("agent_worker.py")
+OnOutput = Callable[[bytes], None]
+
+SPAWN_SECONDS = REGISTRY.histogram("gateway_spawn_seconds", "Time to start a process (worker or one-shot)", ["mode"])
+EXEC_SECONDS = REGISTRY.histogram("gateway_exec_seconds", "Agent execution time, excluding process start",
+                                  ["agent", "mode"])
+
+async def _feed(stdin: asyncio.StreamWriter, body: bytes):
+    try:
+        stdin.write(body)
+        await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # the agent exited without reading all of its input
+    finally:
+        stdin.close()
+
+async def _pump(proc: asyncio.subprocess.Process, body: bytes, on_output: OnOutput) -> int:
+    # stdin is fed while stdout is read (as communicate() does), so an agent that
+    # prints a pipe's worth before reading a large body cannot deadlock with us
+    feeder = asyncio.ensure_future(_feed(proc.stdin, body))
+    try:
+        while True:
+            chunk = await proc.stdout.read(64 * 1024)
+            if not chunk: break
+            on_output(chunk)
+        await feeder
+        return await proc.wait()
+    finally:
+        feeder.cancel()
+
+async def spawn_run(path: pathlib.Path, body: bytes, timeout: float, on_output: OnOutput) -> int:
+    """Run an agent as a fresh ``python3`` process (script-only fallback)."""
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(path),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT)
+    spawned = time.perf_counter()
+    SPAWN_SECONDS.labels("process").observe(spawned - started)
+    try:
+        return await asyncio.wait_for(_pump(proc, body, on_output), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill(); await proc.wait()
+        raise
+    finally:
+        EXEC_SECONDS.labels(path.stem, "process").observe(time.perf_counter() - spawned)
+
+class WorkerDied(RuntimeError):
+    pass
+
+class AgentWorker:
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc, self.jobs = proc, 0
+
+    @classmethod
+    async def start(cls) -> "AgentWorker":
+        started = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, str(WORKER),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE)
+        w = cls(proc)
+        hello = await w._header()
+        if not hello.get("ready"):
+            w.kill(); raise WorkerDied("worker failed to start")
+        SPAWN_SECONDS.labels("worker").observe(time.perf_counter() - started)
+        return w
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def _header(self) -> dict:
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise WorkerDied(f"worker {self.proc.pid} exited")
+        return json.loads(line)
+
+    async def run(self, path: pathlib.Path, body: bytes, on_output: OnOutput) -> int:
+        self.jobs += 1
+        self.proc.stdin.write(json.dumps({"path": str(path), "size": len(body)}).encode() + b"\n" + body)
+        await self.proc.stdin.drain()
+        while True:
+            h = await self._header()
+            if "exit_code" in h:
+                return h["exit_code"]
+            on_output(await self.proc.stdout.readexactly(h["out"]))
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+
+    async def close(self):
+        if self.alive:
+            self.proc.stdin.close()
+            try: await asyncio.wait_for(self.proc.wait(), timeout=2)
+            except asyncio.TimeoutError: self.kill()
+
+class WorkerPool:
+    def __init__(self, size: int, max_jobs: int = 200, spawn_agents: Iterable[str] = ()):
+        REGISTRY.gauge("gateway_pool_idle_workers", "Warm workers waiting for a job", fn=self.idle)
+        self.size, self.max_jobs = size, max_jobs
+        self.spawn_agents = set(spawn_agents)
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers = set()
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        return cls(
+            size=int(os.getenv("GATEWAY_POOL_SIZE", str(min(4, os.cpu_count() or 1)))),
+            max_jobs=int(os.getenv("GATEWAY_POOL_MAX_JOBS", "200")),
+            spawn_agents=[a for a in os.getenv("GATEWAY_SPAWN_AGENTS", "").split(",") if a])
+
+    def idle(self) -> int:
+        return self._idle.qsize() if self._idle is not None else 0
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(self._replace() for _ in range(self.size)))
+
+    async def _replace(self):
+        try:
+            w = await AgentWorker.start()
+        except Exception:
+            return  # the next job for this slot falls back to spawn mode
+        self._workers.add(w)
+        self._idle.put_nowait(w)
+
+    def _retire(self, w: AgentWorker, broken: bool):
+        self._workers.discard(w)
+        if broken: w.kill()
+        else: asyncio.create_task(w.close())
+        asyncio.create_task(self._replace())
+
+    async def run(self, agent: str, path: pathlib.Path, body: bytes, timeout: float,
+                  on_output: OnOutput) -> int:
+        """Run one job, feeding stdout chunks to ``on_output``; returns the exit code."""
+        if self._idle is None or not self._workers or agent in self.spawn_agents:
+            return await spawn_run(path, body, timeout, on_output)
+        w = await self._idle.get()
+        broken = True
+        started = time.perf_counter()
+        try:
+            code = await asyncio.wait_for(w.run(path, body, on_output), timeout=timeout)
+            broken = False
+            return code
+        except (WorkerDied, asyncio.IncompleteReadError):
+            # the agent took the worker down (os._exit, crash): report its
+            # exit status just like a spawned process would
+            return await w.proc.wait()
+        finally:
+            EXEC_SECONDS.labels(agent, "pool").observe(time.perf_counter() - started)
+            if broken or not w.alive or w.jobs >= self.max_jobs:
+                self._retire(w, broken)
+            else:
+                self._idle.put_nowait(w)
+
+    async def close(self):
+        workers, self._workers = list(self._workers), set()
+        await asyncio.gather(*(w.close() for w in workers))
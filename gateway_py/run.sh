@@ -3,6 +3,15 @@ set -Eeuo pipefail
 ROOT="$(cd "$(dirname "$0")/.." && pwd)"
 LOGDIR="$ROOT/logs"; mkdir -p "$LOGDIR"
 PORT="${PORT:-8081}"
-nohup python3 "$ROOT/gateway_py/main.py" >"$LOGDIR/gateway_py.out.log" 2>"$LOGDIR/gateway_py.err.log" &
+WORKERS="${GATEWAY_WORKERS:-1}"
+if [ "$WORKERS" -gt 1 ]; then
+  # several processes need the shared job table
+  export GATEWAY_JOB_STORE="${GATEWAY_JOB_STORE:-sqlite}"
+  CMD=(python3 -m uvicorn gateway_py.main:app --host 0.0.0.0 --port "$PORT" --workers "$WORKERS")
+else
+  CMD=(python3 "$ROOT/gateway_py/main.py")
+fi
+cd "$ROOT"
+nohup "${CMD[@]}" >"$LOGDIR/gateway_py.out.log" 2>"$LOGDIR/gateway_py.err.log" &
 echo $! > "$ROOT/run/gateway_py.pid"
 echo "[OK] Python gateway on :$PORT (pid $(cat "$ROOT/run/gateway_py.pid"))"
@@ -0,0 +1,122 @@
+"""Job scheduler for gateway_py.
+
+Jobs wait in one bounded queue and at most ``max_running`` run at once.
+Within that budget:
+
+* priority classes (``high`` > ``normal`` > ``low``) are served strictly in order;
+* inside a class, agents take turns round-robin, so a burst for one agent
+  cannot push every other agent to the back of the line;
+* each agent runs at most ``agent_limit`` jobs at a time (``agent_limits``
+  overrides it per agent), and a batch at most its own ``concurrency``; an
+  agent's jobs queued behind a batch at its limit are still dispatched.
+
+``submit`` never waits: when the queue is full it raises ``QueueFull`` with a
+Retry-After estimate derived from the recent job run time.
+"""
+import asyncio, math, os, time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+PRIORITIES = ("high", "normal", "low")
+
+class QueueFull(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail, self.retry_after = detail, retry_after
+
+Item = Tuple[object, bytes, Optional[object]]   # job, body, group (batch)
+
+class Scheduler:
+    def __init__(self, run: Callable[[object, bytes], Awaitable[None]], max_running: int,
+                 max_queue: int = 1000, agent_limit: int = 2, agent_limits: Optional[Dict[str, int]] = None):
+        self.run, self.max_running, self.max_queue = run, max(1, max_running), max_queue
+        self.agent_limit, self.agent_limits = max(1, agent_limit), dict(agent_limits or {})
+        self._queues: Dict[str, "OrderedDict[str, Deque[Item]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._active: Dict[str, int] = {}
+        self.queued = self.running = 0
+        self._avg_run = 1.0   # EWMA of job run time, seconds
+
+    @classmethod
+    def from_env(cls, run, default_running: int) -> "Scheduler":
+        limits = {}
+        for item in os.getenv("GATEWAY_AGENT_LIMITS", "").split(","):
+            if "=" in item:
+                agent, n = item.split("=", 1)
+                limits[agent.strip()] = int(n)
+        return cls(run,
+                   max_running=int(os.getenv("GATEWAY_MAX_RUNNING", str(default_running))),
+                   max_queue=int(os.getenv("GATEWAY_QUEUE_SIZE", "1000")),
+                   agent_limit=int(os.getenv("GATEWAY_AGENT_CONCURRENCY", "2")),
+                   agent_limits=limits)
+
+    def retry_after(self) -> int:
+        """Seconds until roughly one queue's worth of jobs has drained"""
+        return max(1, min(60, math.ceil(self.queued / self.max_running * self._avg_run)))
+
+    def check_room(self, n: int = 1):
+        if self.queued + n > self.max_queue:
+            raise QueueFull(f"job queue is full ({self.queued}/{self.max_queue})", self.retry_after())
+
+    def submit(self, job, body: bytes, priority: str = "normal", group=None):
+        """Queue a job (raises QueueFull); ``group`` is a batch with ``concurrency``/``active``"""
+        self.check_room()
+        agents = self._queues[priority]
+        agents.setdefault(job.agent, deque()).append((job, body, group))
+        self.queued += 1
+        self._dispatch()
+
+    def _limit(self, agent: str) -> int:
+        return self.agent_limits.get(agent, self.agent_limit)
+
+    def _next(self) -> Optional[Item]:
+        for priority in PRIORITIES:
+            agents = self._queues[priority]
+            for agent, items in agents.items():
+                if self._active.get(agent, 0) >= self._limit(agent):
+                    continue
+                # skip past jobs whose batch is at its concurrency, not just the head
+                i = next((i for i, (_, _, group) in enumerate(items)
+                          if group is None or group.active < group.concurrency), None)
+                if i is None:
+                    continue
+                item = items[i]
+                del items[i]
+                if items:
+                    agents.move_to_end(agent)   # round-robin: next turn goes to another agent
+                else:
+                    del agents[agent]
+                return item
+        return None
+
+    def _dispatch(self):
+        while self.running < self.max_running:
+            item = self._next()
+            if item is None:
+                return
+            job, body, group = item
+            self.queued -= 1
+            self.running += 1
+            self._active[job.agent] = self._active.get(job.agent, 0) + 1
+            if group is not None:
+                group.active += 1
+            asyncio.get_running_loop().create_task(self._run(job, body, group))
+
+    async def _run(self, job, body: bytes, group):
+        started = time.monotonic()
+        try:
+            await self.run(job, body)
+        finally:
+            self._avg_run += 0.2 * (time.monotonic() - started - self._avg_run)
+            self.running -= 1
+            n = self._active[job.agent] - 1
+            if n: self._active[job.agent] = n
+            else: del self._active[job.agent]
+            if group is not None:
+                group.active -= 1
+            self._dispatch()
+
+    def stats(self) -> dict:
+        return {"queued": self.queued, "running": self.running, "max_queue": self.max_queue,
+                "max_running": self.max_running,
+                "queued_by_priority": {p: sum(len(q) for q in self._queues[p].values()) for p in PRIORITIES},
+                "running_by_agent": dict(self._active)}
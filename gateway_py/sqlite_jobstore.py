@@ -0,0 +1,256 @@
+"""SQLite-backed job table shared by every gateway_py process on one host.
+
+With ``GATEWAY_JOB_STORE=sqlite`` job and batch state lives in a WAL-mode
+SQLite database (``GATEWAY_JOB_DB``, default ``<spill dir>/jobs.db``), so
+``uvicorn gateway_py.main:app --workers N`` can answer ``GET /jobs/{id}`` from
+any worker and finished jobs survive a restart.
+
+Ids are ``<pid>-<microseconds>-<seq>`` in hex: unique across processes on the
+host without coordination.  The process that runs a job keeps its live ``Job``
+object (waiters are woken directly) and writes stdout to the job's spill file;
+other processes read the row and the file, polling while the job is
+unfinished.  Jobs left queued or running by a process that has since exited
+are marked as errors when the store is opened.
+"""
+import asyncio, itertools, json, os, pathlib, sqlite3, time
+from typing import Dict, Iterator, List, Optional
+
+from gateway_py.jobstore import Batch, Job, OutputBuffer
+
+POLL_INTERVAL = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    exit_code INTEGER,
+    stderr TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    owner TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished) WHERE finished IS NOT NULL;
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    concurrency INTEGER NOT NULL,
+    created REAL NOT NULL,
+    job_ids TEXT NOT NULL
+);
+"""
+
+class FileOutput:
+    """Read-only view of another process's job output via its spill file"""
+    __slots__ = ("cap", "spill_path")
+
+    def __init__(self, cap: int, spill_path: pathlib.Path):
+        self.cap, self.spill_path = cap, spill_path
+
+    @property
+    def size(self) -> int:
+        try: return self.spill_path.stat().st_size
+        except OSError: return 0
+
+    @property
+    def tail(self) -> bytes:
+        try:
+            with open(self.spill_path, "rb") as f:
+                f.seek(max(0, self.size - self.cap))
+                return f.read()
+        except OSError:
+            return b""
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self.cap
+
+    def read_from(self, pos: int, limit: int = 64 * 1024) -> bytes:
+        try:
+            with open(self.spill_path, "rb") as f:
+                f.seek(pos)
+                return f.read(limit)
+        except OSError:
+            return b""
+
+    def close(self):
+        pass
+
+class StoredJob(Job):
+    """A job owned by another process (or already finished), refreshed from the table"""
+    __slots__ = ("_store",)
+
+    def __init__(self, store: "SqliteJobStore", row: sqlite3.Row):
+        super().__init__(row["id"], row["agent"], FileOutput(store.output_cap, store.spill_path(row["id"])),
+                         row["priority"])
+        self._store = store
+        self._load(row)
+
+    def _load(self, row: sqlite3.Row):
+        self.status, self.exit_code, self.stderr = row["status"], row["exit_code"], row["stderr"]
+        self.created, self.started, self.finished = row["created"], row["started"], row["finished"]
+
+    async def wait_changed(self, timeout: float) -> bool:
+        if self.done: return True
+        before = (self.status, self.output.size)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+            row = self._store._row(self.id)
+            if row is None:  # evicted meanwhile
+                return True
+            self._load(row)
+            if (self.status, self.output.size) != before:
+                return True
+        return False
+
+class SqliteJobStore:
+    def __init__(self, db_path: pathlib.Path, spill_dir: pathlib.Path, ttl: float = 3600,
+                 max_jobs: int = 10000, output_cap: int = 64 * 1024):
+        self.spill_dir, self.ttl, self.max_jobs, self.output_cap = spill_dir, ttl, max_jobs, output_cap
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.owner = f"{os.getpid()}:{time.time_ns():x}"
+        self._seq = itertools.count(1)
+        self._live: Dict[str, Job] = {}
+        self._live_batches: Dict[str, Batch] = {}
+        self._evicted_at = 0.0
+        self.recover()
+
+    @classmethod
+    def from_env(cls, root: pathlib.Path) -> "SqliteJobStore":
+        spill_dir = pathlib.Path(os.getenv("GATEWAY_SPILL_DIR", str(root / "logs" / "jobs")))
+        return cls(db_path=pathlib.Path(os.getenv("GATEWAY_JOB_DB", str(spill_dir / "jobs.db"))),
+                   spill_dir=spill_dir,
+                   ttl=float(os.getenv("GATEWAY_JOB_TTL", "3600")),
+                   max_jobs=int(os.getenv("GATEWAY_MAX_JOBS", "10000")),
+                   output_cap=int(os.getenv("GATEWAY_OUTPUT_CAP", str(64 * 1024))))
+
+    def _new_id(self, prefix: str = "") -> str:
+        return f"{prefix}{os.getpid():x}-{time.time_ns() // 1000:x}-{next(self._seq):x}"
+
+    def spill_path(self, job_id: str) -> pathlib.Path:
+        return self.spill_dir / f"{job_id}.out"
+
+    def _row(self, job_id: str) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _job(self, row: sqlite3.Row) -> Job:
+        return self._live.get(row["id"]) or StoredJob(self, row)
+
+    def recover(self) -> int:
+        """Fail unfinished jobs whose owning process is gone (crash or restart)"""
+        stale = []
+        for (owner,) in self.db.execute("SELECT DISTINCT owner FROM jobs WHERE finished IS NULL"):
+            pid = int(owner.split(":", 1)[0])
+            if pid == os.getpid() or not _pid_alive(pid):  # same pid: a previous incarnation of us
+                stale.append(owner)
+        n = 0
+        for owner in stale:
+            n += self.db.execute(
+                "UPDATE jobs SET status = 'error', finished = ?, "
+                "stderr = 'gateway stopped before the job finished' "
+                "WHERE owner = ? AND finished IS NULL", (time.time(), owner)).rowcount
+        return n
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def create(self, agent: str, priority: str = "normal") -> Job:
+        job_id = self._new_id()
+        job = Job(job_id, agent, OutputBuffer(self.output_cap, self.spill_path(job_id), spill_all=True), priority)
+        self.db.execute("INSERT INTO jobs (id, agent, status, priority, created, owner) VALUES (?, ?, ?, ?, ?, ?)",
+                        (job.id, agent, job.status, priority, job.created, self.owner))
+        self._live[job_id] = job
+        if time.monotonic() - self._evicted_at > 1.0:
+            self.evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._live.get(job_id)
+        if job is not None:
+            return job
+        row = self._row(job_id)
+        return StoredJob(self, row) if row else None
+
+    def start(self, job: Job):
+        job.status, job.started = "running", time.time()
+        self.db.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (job.status, job.started, job.id))
+
+    def finish(self, job: Job, status: str, exit_code: Optional[int] = None, stderr: str = ""):
+        job.status, job.finished = status, time.time()
+        if exit_code is not None: job.exit_code = exit_code
+        if stderr: job.stderr = stderr
+        job.output.close()
+        self.db.execute("UPDATE jobs SET status = ?, exit_code = ?, stderr = ?, finished = ? WHERE id = ?",
+                        (status, job.exit_code, job.stderr, job.finished, job.id))
+        self._live.pop(job.id, None)
+        job.notify()
+        for batch_id in [b.id for b in self._live_batches.values() if b.done]:
+            del self._live_batches[batch_id]
+
+    def create_batch(self, jobs: List[Job], concurrency: int) -> Batch:
+        batch = Batch(self._new_id("b"), jobs, concurrency)
+        self.db.execute("INSERT INTO batches (id, concurrency, created, job_ids) VALUES (?, ?, ?, ?)",
+                        (batch.id, concurrency, batch.created, json.dumps([j.id for j in jobs])))
+        self._live_batches[batch.id] = batch
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        batch = self._live_batches.get(batch_id)
+        if batch is not None:
+            return batch
+        row = self.db.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        ids = json.loads(row["job_ids"])
+        rows = {r["id"]: r for r in self.db.execute(
+            f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        batch = Batch(row["id"], [self._job(rows[i]) for i in ids if i in rows], row["concurrency"])
+        batch.created = row["created"]
+        return batch
+
+    def evict(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        self._evicted_at = time.monotonic()
+        expired = [r[0] for r in self.db.execute(
+            "SELECT id FROM jobs WHERE finished IS NOT NULL AND finished <= ?", (now - self.ttl,))]
+        excess = len(self) - len(expired) - self.max_jobs
+        if excess > 0:
+            expired += [r[0] for r in self.db.execute(
+                "SELECT id FROM jobs WHERE finished IS NOT NULL AND finished > ? ORDER BY finished LIMIT ?",
+                (now - self.ttl, excess))]
+        if not expired:
+            return 0
+        for i in range(0, len(expired), 500):
+            chunk = expired[i:i + 500]
+            self.db.execute(f"DELETE FROM jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        # a batch goes once all its members have finished and gone (only finished jobs are deleted)
+        self.db.execute("DELETE FROM batches WHERE NOT EXISTS "
+                        "(SELECT 1 FROM json_each(batches.job_ids) AS m JOIN jobs ON jobs.id = m.value)")
+        for job_id in expired:
+            try: os.remove(self.spill_path(job_id))
+            except OSError: pass
+        return len(expired)
+
+    def page(self, offset: int = 0, limit: int = 50, status: Optional[str] = None) -> Iterator[Job]:
+        if status:
+            rows = self.db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY rowid LIMIT ? OFFSET ?",
+                                   (status, limit, offset))
+        else:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY rowid LIMIT ? OFFSET ?", (limit, offset))
+        return iter([self._job(r) for r in rows])
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,15 +1,29 @@
 #!/usr/bin/env python3
 """
 Agent Health Check for AiKre8tive Sovereign Agent System
+
+Each agent is loaded in its own worker process (at most ``--workers`` at a
+time) and killed after ``--timeout`` seconds, so a crashing or hanging agent
+cannot stall the report.  Agents that passed the previous report (healthy or
+warning) with the same file hash are not re-checked unless ``--force`` is
+given; failures are always re-checked.
 """
 
 import os
 import sys
 import json
+import time
+import hashlib
+import argparse
 import importlib.util
+import multiprocessing
+from multiprocessing.connection import wait
 from pathlib import Path
 from datetime import datetime
 
+REPORT_PATH = Path("logs/agent_health_report.json")
+REUSABLE = ("healthy", "warning")   # results worth reusing while the source is unchanged
+
 def load_agent(agent_path):
     """Load an agent module from file path"""
     try:
@@ -36,7 +50,9 @@ def check_agent_health(agent_name, agent_path):
         return health_status
     
     # Try to load the agent
+    started = time.perf_counter()
     module = load_agent(agent_path)
+    health_status["load_ms"] = round((time.perf_counter() - started) * 1000, 2)
     if module is None:
         health_status["status"] = "error"
         health_status["errors"].append("Failed to load agent module")
@@ -56,8 +72,87 @@ def check_agent_health(agent_name, agent_path):
     
     return health_status
 
+def file_hash(agent_path):
+    """sha256 of the agent source, or None if it is missing"""
+    try:
+        return hashlib.sha256(Path(agent_path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+def _check_in_child(agent_name, agent_path, conn):
+    """Worker process entry: silence agent output, check, send the result back"""
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        conn.send(check_agent_health(agent_name, agent_path))
+    finally:
+        conn.close()
+
+def run_checks(jobs, workers, timeout):
+    """
+    Check ``jobs`` ((name, path) pairs) in isolated processes, ``workers`` at a time
+    
+    Returns:
+        dict of agent name -> health status
+    """
+    ctx = multiprocessing.get_context()
+    pending, running, results = list(jobs), {}, {}
+    while pending or running:
+        while pending and len(running) < workers:
+            agent_name, agent_path = pending.pop(0)
+            parent, child = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_check_in_child, args=(agent_name, agent_path, child), daemon=True)
+            proc.start()
+            child.close()
+            running[parent] = (agent_name, proc, time.monotonic())
+        deadline = min(started + timeout for _, _, started in running.values())
+        for conn in wait(list(running), timeout=max(0, deadline - time.monotonic())):
+            agent_name, proc, _ = running.pop(conn)
+            try:
+                results[agent_name] = conn.recv()
+            except EOFError:  # the child died without reporting
+                proc.join()
+                results[agent_name] = {
+                    "agent": agent_name,
+                    "timestamp": datetime.now().isoformat(),
+                    "status": "error",
+                    "errors": [f"Check process exited with code {proc.exitcode}"]
+                }
+            conn.close()
+            proc.join()
+        now = time.monotonic()
+        for conn, (agent_name, proc, started) in list(running.items()):
+            if now - started >= timeout:
+                proc.kill()
+                proc.join()
+                conn.close()
+                del running[conn]
+                results[agent_name] = {
+                    "agent": agent_name,
+                    "timestamp": datetime.now().isoformat(),
+                    "status": "timeout",
+                    "errors": [f"Agent did not load within {timeout}s"],
+                    "load_ms": round(timeout * 1000, 2)
+                }
+    return results
+
+def load_previous_report(path=REPORT_PATH):
+    try:
+        with open(path) as f:
+            return {a["agent"]: a for a in json.load(f).get("agents", [])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
 def main():
     """Main health check execution"""
+    parser = argparse.ArgumentParser(description="Check that every agent module loads")
+    parser.add_argument("--force", action="store_true", help="re-check agents whose source is unchanged")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1),
+                        help="agents checked in parallel")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds allowed per agent")
+    args = parser.parse_args()
+    
     print("🏥 AiKre8tive Agent Health Check")
     print("================================")
     
@@ -80,33 +175,61 @@ def main():
         "healthy": 0,
         "warnings": 0,
         "errors": 0,
+        "timeouts": 0,
         "missing": 0,
+        "checked": 0,
+        "skipped": 0,
         "agents": []
     }
     
+    previous = {} if args.force else load_previous_report()
+    hashes, results, jobs = {}, {}, []
     for agent_name in all_agents:
         agent_path = agents_dir / f"{agent_name}.py"
-        health_status = check_agent_health(agent_name, agent_path)
+        hashes[agent_name] = file_hash(agent_path)
+        prior = previous.get(agent_name)
+        if (prior and hashes[agent_name] and prior.get("sha256") == hashes[agent_name]
+                and prior.get("status") in REUSABLE):
+            results[agent_name] = dict(prior, cached=True)
+        elif hashes[agent_name] is None:
+            results[agent_name] = check_agent_health(agent_name, agent_path)
+        else:
+            jobs.append((agent_name, agent_path))
+    
+    started = time.perf_counter()
+    results.update(run_checks(jobs, max(1, args.workers), args.timeout))
+    elapsed = time.perf_counter() - started
+    health_report["checked"] = len(jobs)
+    health_report["skipped"] = len(all_agents) - len(jobs)
+    
+    for agent_name in all_agents:
+        health_status = results[agent_name]
+        health_status["sha256"] = hashes[agent_name]
         health_report["agents"].append(health_status)
         
         # Update counters
         status = health_status["status"]
+        load = f" ({health_status['load_ms']:.0f} ms)" if "load_ms" in health_status else ""
+        cached = " [unchanged]" if health_status.get("cached") else ""
         if status == "healthy":
             health_report["healthy"] += 1
-            print(f"✅ {agent_name}: Healthy")
+            print(f"✅ {agent_name}: Healthy{load}{cached}")
         elif status == "warning":
             health_report["warnings"] += 1
-            print(f"⚠️  {agent_name}: Warning - {', '.join(health_status['errors'])}")
+            print(f"⚠️  {agent_name}: Warning - {', '.join(health_status['errors'])}{load}{cached}")
         elif status == "error":
             health_report["errors"] += 1
-            print(f"❌ {agent_name}: Error - {', '.join(health_status['errors'])}")
+            print(f"❌ {agent_name}: Error - {', '.join(health_status['errors'])}{cached}")
+        elif status == "timeout":
+            health_report["timeouts"] += 1
+            print(f"⏱️  {agent_name}: Timeout - {', '.join(health_status['errors'])}{cached}")
         elif status == "missing":
             health_report["missing"] += 1
             print(f"📁 {agent_name}: Missing")
     
     # Save detailed report
-    os.makedirs("logs", exist_ok=True)
-    with open("logs/agent_health_report.json", "w") as f:
+    REPORT_PATH.parent.mkdir(exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
         json.dump(health_report, f, indent=2)
     
     # Print summary
@@ -114,12 +237,19 @@ def main():
     print(f"   ✅ Healthy: {health_report['healthy']}")
     print(f"   ⚠️  Warnings: {health_report['warnings']}")
     print(f"   ❌ Errors: {health_report['errors']}")
+    print(f"   ⏱️  Timeouts: {health_report['timeouts']}")
     print(f"   📁 Missing: {health_report['missing']}")
     print(f"   📈 Health Rate: {health_report['healthy'] * 100 // len(all_agents)}%")
+    print(f"   🔁 Checked {health_report['checked']}, unchanged {health_report['skipped']} ({elapsed:.2f}s)")
+    
+    slowest = sorted((a for a in health_report["agents"] if "load_ms" in a),
+                     key=lambda a: a["load_ms"], reverse=True)[:3]
+    if slowest:
+        print("   🐢 Slowest loads: " + ", ".join(f"{a['agent']} {a['load_ms']:.0f} ms" for a in slowest))
     
-    print(f"\n📄 Detailed report saved to: logs/agent_health_report.json")
+    print(f"\n📄 Detailed report saved to: {REPORT_PATH}")
     
-    return 0 if health_report['errors'] == 0 else 1
+    return 0 if health_report['errors'] == 0 and health_report['timeouts'] == 0 else 1
 
 if __name__ == "__main__":
     sys.exit(main())
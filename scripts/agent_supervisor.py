@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Fork-server supervisor for the AiKre8tive planetary agents
+
+The supervisor imports the ``preload`` modules once, freezes the garbage
+collector and then forks one child per agent, so every agent starts without
+re-importing shared code and shares those pages copy-on-write with the
+parent.  The agent list comes from ``config/system_config.json`` (every list
+under ``agents``, run from ``backend/agents``) plus every standalone script in
+``agents/`` (Recon and the like, which the old launcher also started);
+settings come from the config's ``supervisor`` section.
+
+Agents that exit with an error (or any exit, with ``restart: "always"``) are
+restarted after a backoff that doubles per crash up to ``backoff_max`` and
+resets once an agent has stayed up for ``stable_after`` seconds.  Every
+``report_interval`` seconds per-agent CPU and memory (RSS, and PSS, which
+splits shared pages between the processes that map them) are sampled from
+/proc and written to ``logs/agent_supervisor.json``; ``--status`` prints the
+latest report and SIGUSR1 prints it to the supervisor log.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import runpy
+import signal
+import argparse
+import importlib
+import traceback
+from pathlib import Path
+from datetime import datetime
+
+ROOT = Path(__file__).resolve().parent.parent
+CONFIG_PATH = ROOT / "config" / "system_config.json"
+AGENTS_DIR = ROOT / "backend" / "agents"
+SCRIPTS_DIR = ROOT / "agents"
+LOG_DIR = ROOT / "logs"
+STATUS_PATH = LOG_DIR / "agent_supervisor.json"
+
+DEFAULTS = {
+    "preload": ["json", "logging", "asyncio", "backend.agents", "backend.codec"],
+    "restart": "on-failure",     # or "always"
+    "backoff_initial": 1.0,
+    "backoff_max": 60.0,
+    "stable_after": 30.0,
+    "report_interval": 10.0,
+    "stop_timeout": 10.0
+}
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+POLL_INTERVAL = 0.5
+
+def load_config(path=CONFIG_PATH, agents_dir=AGENTS_DIR, scripts_dir=SCRIPTS_DIR):
+    """Agent name -> script (config order, then ``scripts_dir``) and supervisor settings"""
+    with open(path) as f:
+        config = json.load(f)
+    groups = config.get("agents", {})
+    agents = {name: Path(agents_dir) / f"{name}.py" for names in groups.values() for name in names}
+    for script in sorted(Path(scripts_dir).glob("*.py")):
+        if not script.name.startswith("_"):
+            agents.setdefault(script.stem, script)
+    return agents, {**DEFAULTS, **config.get("supervisor", {})}
+
+def preload(modules):
+    """Import shared modules once in the parent; returns the ones that loaded"""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            print(f"⚠️  Preload of {name} failed: {e}")
+    # keep the collector from touching (and so un-sharing) preloaded objects in the children
+    gc.collect()
+    gc.freeze()
+    return loaded
+
+def proc_stats(pid):
+    """(cpu seconds, rss bytes, pss bytes or None) from /proc, or None if unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK    # utime + stime (fields 14, 15)
+    rss = int(fields[21]) * PAGE_SIZE                    # field 24
+    pss = None
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    return cpu, rss, pss
+
+def _run_agent(path, log_path):
+    """Forked child: run the agent script as __main__ with output to its log"""
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    code = 1
+    try:
+        fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        os.close(fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        sys.argv = [str(path)]
+        runpy.run_path(str(path), run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+class AgentProcess:
+    """One supervised agent and its restart / resource bookkeeping"""
+
+    def __init__(self, name, path, backoff):
+        self.name, self.path = name, Path(path)
+        self.pid = None
+        self.status = "pending"
+        self.started = None           # monotonic start of the current run
+        self.restarts = 0
+        self.backoff = backoff
+        self.next_start = 0.0
+        self.last_exit = None
+        self.cpu = 0.0                # cpu seconds of the current run
+        self.cpu_percent = 0.0
+        self.rss = self.pss = None
+        self._sampled = None          # (monotonic time, cpu seconds)
+
+    def info(self, now):
+        return {
+            "agent": self.name,
+            "status": self.status,
+            "pid": self.pid,
+            "restarts": self.restarts,
+            "uptime": round(now - self.started, 1) if self.pid else None,
+            "last_exit": self.last_exit,
+            "cpu_seconds": round(self.cpu, 2),
+            "cpu_percent": round(self.cpu_percent, 1),
+            "rss": self.rss,
+            "pss": self.pss
+        }
+
+class Supervisor:
+    def __init__(self, agents, settings, log_dir=LOG_DIR, status_path=STATUS_PATH):
+        """``agents`` maps each agent name to the script it runs"""
+        self.settings, self.log_dir, self.status_path = settings, Path(log_dir), Path(status_path)
+        self.agents = [AgentProcess(name, path, settings["backoff_initial"]) for name, path in agents.items()]
+        self.by_pid = {}
+        self.preloaded = []
+        self._stopping = False
+        self._print_requested = False
+
+    def spawn(self, agent):
+        if not agent.path.exists():
+            agent.status = "missing"
+            print(f"📁 {agent.name}: {agent.path} not found")
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_agent(agent.path, self.log_dir / f"{agent.name}.log")
+        agent.pid, agent.status, agent.started = pid, "running", time.monotonic()
+        agent.cpu, agent.cpu_percent, agent._sampled = 0.0, 0.0, None
+        self.by_pid[pid] = agent
+
+    def reap(self):
+        """Collect exited children and schedule restarts"""
+        while self.by_pid:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self._exited(pid, status)
+
+    def _exited(self, pid, status):
+        """Record a reaped child's exit and decide whether it restarts"""
+        agent = self.by_pid.pop(pid, None)
+        if agent is None:
+            return
+        code = os.waitstatus_to_exitcode(status)
+        now = time.monotonic()
+        ran = now - agent.started
+        agent.pid, agent.rss, agent.pss = None, None, None
+        agent.last_exit = {"code": code, "at": datetime.now().isoformat(), "ran": round(ran, 1)}
+        failed = code != 0
+        if self._stopping:
+            agent.status = "stopped"
+        elif failed or self.settings["restart"] == "always":
+            if ran >= self.settings["stable_after"]:
+                agent.backoff = self.settings["backoff_initial"]
+            agent.status, agent.next_start = "backoff", now + agent.backoff
+            reason = f"signal {-code}" if code < 0 else f"code {code}"
+            print(f"🔁 {agent.name}: exited with {reason} after {ran:.1f}s, restarting in {agent.backoff:g}s")
+            agent.backoff = min(agent.backoff * 2, self.settings["backoff_max"])
+        else:
+            agent.status = "exited"
+            print(f"⚪ {agent.name}: exited cleanly after {ran:.1f}s")
+
+    def start_due(self):
+        now = time.monotonic()
+        for agent in self.agents:
+            if agent.status == "pending" or (agent.status == "backoff" and now >= agent.next_start):
+                if agent.status == "backoff":
+                    agent.restarts += 1
+                self.spawn(agent)
+
+    def sample(self):
+        now = time.monotonic()
+        for agent in self.agents:
+            stats = proc_stats(agent.pid) if agent.pid else None
+            if stats is None:
+                continue
+            agent.cpu, agent.rss, agent.pss = stats
+            if agent._sampled is not None and now > agent._sampled[0]:
+                agent.cpu_percent = 100 * (agent.cpu - agent._sampled[1]) / (now - agent._sampled[0])
+            agent._sampled = (now, agent.cpu)
+
+    def report(self):
+        now = time.monotonic()
+        agents = [a.info(now) for a in self.agents]
+        running = [a for a in agents if a["status"] == "running"]
+        own = proc_stats(os.getpid())
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "supervisor": {"pid": os.getpid(), "preloaded": self.preloaded,
+                           "rss": own[1] if own else None, "pss": own[2] if own else None},
+            "running": len(running),
+            "restarts": sum(a["restarts"] for a in agents),
+            "total_rss": sum(a["rss"] or 0 for a in running),
+            "total_pss": sum(a["pss"] or 0 for a in running),
+            "agents": agents
+        }
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.status_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, self.status_path)
+        return report
+
+    def active(self):
+        return any(a.status in ("pending", "running", "backoff") for a in self.agents)
+
+    def stop(self):
+        """SIGTERM every agent, SIGKILL whatever is left after ``stop_timeout``"""
+        self._stopping = True
+        for pid in list(self.by_pid):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.settings["stop_timeout"]
+        while self.by_pid and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.by_pid):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.by_pid:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self._exited(pid, status)
+        for agent in self.agents:
+            if agent.status in ("pending", "running", "backoff"):
+                agent.status = "stopped"
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _request_print(self, signum, frame):
+        self._print_requested = True
+
+    def run(self):
+        """Supervise until stopped or until no agent is left to run"""
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        self.preloaded = preload(self.settings["preload"])
+        print(f"📦 Preloaded {len(self.preloaded)} modules in {(time.perf_counter() - started) * 1000:.0f} ms")
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGUSR1, self._request_print)
+
+        started = time.perf_counter()
+        self.start_due()
+        print(f"🚀 Forked {len(self.by_pid)} agents in {(time.perf_counter() - started) * 1000:.0f} ms")
+        next_report = 0.0
+        while not self._stopping and self.active():
+            self.reap()
+            self.start_due()
+            now = time.monotonic()
+            if now >= next_report or self._print_requested:
+                self.sample()
+                report = self.report()
+                if self._print_requested:
+                    print_report(report)
+                    self._print_requested = False
+                next_report = now + self.settings["report_interval"]
+            time.sleep(POLL_INTERVAL)
+        if self.by_pid:
+            print(f"🛑 Stopping {len(self.by_pid)} agents")
+        self.stop()
+        self.report()
+
+def _mb(value):
+    return f"{value / 1048576:7.1f}" if value is not None else "      -"
+
+def print_report(report):
+    print(f"🛰️  Agent supervisor pid {report['supervisor']['pid']} — {report['timestamp']}")
+    print(f"   {'agent':<10} {'status':<8} {'pid':>7} {'restarts':>8} {'cpu%':>6} {'rss MB':>7} {'pss MB':>7}  last exit")
+    for a in report["agents"]:
+        last = a["last_exit"]
+        exit_info = f"code {last['code']} after {last['ran']}s" if last else ""
+        print(f"   {a['agent']:<10} {a['status']:<8} {a['pid'] or '-':>7} {a['restarts']:>8} "
+              f"{a['cpu_percent']:>6.1f} {_mb(a['rss'])} {_mb(a['pss'])}  {exit_info}")
+    print(f"   running {report['running']}, restarts {report['restarts']}, "
+          f"total RSS {report['total_rss'] / 1048576:.1f} MB, total PSS {report['total_pss'] / 1048576:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fork and supervise the agents in system_config.json and agents/")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="system config file")
+    parser.add_argument("--agents", nargs="+", help="supervise only these agents")
+    parser.add_argument("--list", action="store_true", help="print the configured agent names and exit")
+    parser.add_argument("--paths", action="store_true", help="with --list, print \"name<TAB>script path\"")
+    parser.add_argument("--status", action="store_true", help="print the latest report and exit")
+    args = parser.parse_args()
+
+    agents, settings = load_config(args.config)
+    if args.list:
+        print("\n".join(f"{name}\t{path}" if args.paths else name for name, path in agents.items()))
+        return 0
+    if args.status:
+        try:
+            with open(STATUS_PATH) as f:
+                print_report(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"❌ No supervisor report: {e}")
+            return 1
+        return 0
+    if not hasattr(os, "fork"):
+        print("❌ The agent supervisor needs os.fork (Linux, Termux, macOS)")
+        return 1
+    if args.agents:
+        unknown = set(args.agents) - set(agents)
+        if unknown:
+            print(f"❌ Not in {args.config}: {', '.join(sorted(unknown))}")
+            return 1
+        agents = {name: path for name, path in agents.items() if name in args.agents}
+
+    print("🌌 AiKre8tive Agent Supervisor")
+    print("==============================")
+    Supervisor(agents, settings).run()
+    print_report(json.loads(STATUS_PATH.read_text()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmarks for the AiKre8tive gateways and WhisperSync storage
+
+HTTP benchmarks start a service on localhost, in a subprocess (default) or
+in-process on a background thread (``--in-process``), or target an already
+running one (``--url``).  Load is either
+
+* closed loop: ``--concurrency`` clients, each sending its next request as soon
+  as the previous one finishes, or
+* open loop: requests arrive at ``--rate`` per second regardless of how fast the
+  service answers; latency is measured from the scheduled send time, so
+  queueing shows up in the tail instead of silently lowering the rate.
+
+Requests cycle through a weighted agent mix (``--agents Earth:3,Io:1``) and
+payload sizes (``--payload-sizes 64,4096``).  Results report RPS and
+p50/p95/p99 latency and can be saved with ``--json`` to compare builds.
+
+    python scripts/benchmark.py http --service unified gateway_py --duration 10
+    python scripts/benchmark.py http --service flask --mode open --rate 500
+    python scripts/benchmark.py storage --records 10000 100000 --storage segments partitioned
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+BENCH_TOKEN = "benchmark"
+
+with open(ROOT / "config" / "system_config.json") as f:
+    GROUPS = json.load(f)["gateway_groups"]
+ALL_AGENTS = [a for names in GROUPS.values() for a in names]
+
+# name -> how to start it and what to send
+SERVICES = {
+    "gateway_py": {"app": "gateway_py.main:app", "kind": "asgi", "path": "/run/{agent}", "body": "raw"},
+    "unified": {"app": "api.unified:app", "kind": "asgi", "path": "/agent/{agent}", "body": "wrapped"},
+    **{group: {"app": f"api.{group}:app", "kind": "asgi", "path": "/agent/{agent}", "body": "wrapped",
+               "agents": names} for group, names in GROUPS.items()},
+    "flask": {"app": "api.gateway:app", "kind": "wsgi", "path": "/run/{agent}", "body": "raw"},
+    "relay": {"app": "api.relay:app", "kind": "asgi", "path": "/", "body": "raw", "upstream": True},
+}
+
+
+# ---------------------------------------------------------------- services
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"service on port {port} did not start within {timeout}s")
+
+class _EchoUpstream(BaseHTTPRequestHandler):
+    """Stand-in for the private gateway's /task behind the relay"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("content-length", "0")))
+        reply = json.dumps({"ok": True, "received": len(body)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+class Service:
+    """A gateway listening on localhost for the duration of a benchmark"""
+
+    def __init__(self, name, in_process=False):
+        self.name, self.spec, self.in_process = name, SERVICES[name], in_process
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {"PYTHONPATH": str(ROOT)}
+        self._proc = self._server = self._upstream = None
+
+    def __enter__(self):
+        if self.spec.get("upstream"):
+            self._upstream = ThreadingHTTPServer(("127.0.0.1", 0), _EchoUpstream)
+            threading.Thread(target=self._upstream.serve_forever, daemon=True).start()
+            self.env.update(GATEWAY_URL=f"http://127.0.0.1:{self._upstream.server_port}",
+                            AIKRE8TIVE_TOKEN=BENCH_TOKEN)
+        if self.in_process:
+            os.environ.update(self.env)
+            self._start_thread()
+        else:
+            self._start_subprocess()
+        wait_for_port(self.port)
+        return self
+
+    def _start_subprocess(self):
+        module, _, attr = self.spec["app"].partition(":")
+        if self.spec["kind"] == "asgi":
+            cmd = [sys.executable, "-m", "uvicorn", self.spec["app"], "--port", str(self.port),
+                   "--log-level", "warning"]
+        else:
+            cmd = [sys.executable, "-m", "flask", "--app", f"{module}:{attr}", "run",
+                   "--port", str(self.port)]
+        self._proc = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **self.env},
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _start_thread(self):
+        import importlib
+        module, _, attr = self.spec["app"].partition(":")
+        os.chdir(ROOT)
+        app = getattr(importlib.import_module(module), attr)
+        if self.spec["kind"] == "asgi":
+            import uvicorn
+            self._server = uvicorn.Server(uvicorn.Config(app, port=self.port, log_level="warning"))
+            self._server.install_signal_handlers = lambda: None
+            threading.Thread(target=self._server.run, daemon=True).start()
+        else:
+            from werkzeug.serving import make_server
+            self._server = make_server("127.0.0.1", self.port, app, threaded=True)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def __exit__(self, *exc):
+        if self._proc is not None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        elif hasattr(self._server, "should_exit"):
+            self._server.should_exit = True
+        elif self._server is not None:
+            self._server.shutdown()
+        if self._upstream is not None:
+            self._upstream.shutdown()
+
+
+# ------------------------------------------------------------------- load
+
+def parse_mix(spec, default):
+    """``Earth:3,Io`` -> [(agent, weight)]"""
+    if not spec:
+        return [(a, 1) for a in default]
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.partition(":")
+        mix.append((name.strip(), int(weight or 1)))
+    return mix
+
+def make_requests(spec, mix, sizes, count=512, seed=1):
+    """A fixed, seeded cycle of (path, body) pairs so runs are comparable"""
+    rng = random.Random(seed)
+    agents, weights = zip(*mix)
+    requests = []
+    for _ in range(count):
+        agent = rng.choices(agents, weights)[0]
+        payload = {"message": "x" * rng.choice(sizes), "source": "benchmark"}
+        body = {"payload": payload} if spec["body"] == "wrapped" else payload
+        requests.append((spec["path"].format(agent=agent), json.dumps(body).encode()))
+    return requests
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies, statuses, errors, elapsed):
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+async def drive(url, requests, mode, duration, concurrency, rate, warmup, timeout):
+    import httpx
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {BENCH_TOKEN}"}
+    limits = httpx.Limits(max_connections=max(concurrency, 1), max_keepalive_connections=max(concurrency, 1))
+    latencies, statuses, errors = [], {}, 0
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=timeout) as client:
+        async def one(i, scheduled, record):
+            nonlocal errors
+            path, body = requests[i % len(requests)]
+            try:
+                resp = await client.post(path, content=body)
+                await resp.aread()
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = None
+            if record:
+                if status is None or status >= 400:
+                    errors += 1
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(time.perf_counter() - scheduled)
+
+        for i in range(warmup):
+            await one(i, time.perf_counter(), False)
+
+        start = time.perf_counter()
+        end = start + duration
+        if mode == "closed":
+            counter = iter(range(10 ** 12))
+
+            async def client_loop():
+                while time.perf_counter() < end:
+                    t = time.perf_counter()
+                    await one(next(counter), t, True)
+            await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        else:
+            tasks, interval = [], 1.0 / rate
+            i = 0
+            while True:
+                scheduled = start + i * interval
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(i, scheduled, True)))
+                i += 1
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, statuses, errors, elapsed)
+
+def bench_http(args):
+    results = []
+    for name in args.service:
+        spec = SERVICES[name]
+        mix = parse_mix(args.agents, spec.get("agents", ALL_AGENTS))
+        sizes = [int(s) for s in args.payload_sizes.split(",")]
+        requests = make_requests(spec, mix, sizes)
+        load = dict(mode=args.mode, duration=args.duration, concurrency=args.concurrency,
+                    rate=args.rate, warmup=args.warmup, timeout=args.timeout)
+        if args.url:
+            result = asyncio.run(drive(args.url, requests, **load))
+        else:
+            with Service(name, in_process=args.in_process) as service:
+                result = asyncio.run(drive(service.url, requests, **load))
+        result.update(service=name, mode=args.mode,
+                      load=args.concurrency if args.mode == "closed" else args.rate)
+        results.append(result)
+        print(f"{name:<11} {args.mode:<6} {result['requests']:>8} req {result['errors']:>6} err "
+              f"{result['rps']:>9.1f} rps  p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+              f"p99 {result['p99_ms']:>8.2f}  max {result['max_ms']:>8.2f} ms")
+    return results
+
+
+# ---------------------------------------------------------------- storage
+
+def bench_storage(args):
+    logging.getLogger("sync.whisper_sync").setLevel(logging.WARNING)
+    from sync.whisper_sync import WhisperSync
+    results = []
+    agents = ALL_AGENTS
+    for storage in args.storage:
+        for count in args.records:
+            with tempfile.TemporaryDirectory(prefix="whisper-bench-") as tmp:
+                config = {"sync_directory": str(Path(tmp) / "sync"), "storage": storage,
+                          "write_mode": args.write_mode, "batch_size": args.batch_size,
+                          "agents": agents}
+                config_path = Path(tmp) / "whisper_config.json"
+                config_path.write_text(json.dumps(config))
+                ws = WhisperSync(str(config_path))
+                data = {"status": "active", "message": "x" * args.record_size}
+
+                latencies = []
+                start = time.perf_counter()
+                futures = []
+                for i in range(count):
+                    t = time.perf_counter()
+                    futures.append(ws.submit_sync(agents[i % len(agents)], data))
+                    latencies.append(time.perf_counter() - t)
+                for future in futures:
+                    future.result()
+                write_s = time.perf_counter() - start
+                latencies.sort()
+
+                lookups = max(10000, len(agents))
+                start = time.perf_counter()
+                for i in range(lookups):
+                    ws.get_latest_sync(agents[i % len(agents)])
+                latest_s = time.perf_counter() - start
+
+                ws.close()
+                start = time.perf_counter()
+                ws = WhisperSync(str(config_path))
+                reopen_s = time.perf_counter() - start
+
+                start = time.perf_counter()
+                deleted = ws.cleanup_old_syncs(days_old=-1)   # cutoff in the future: drop everything
+                cleanup_s = time.perf_counter() - start
+                ws.close()
+
+            result = {
+                "storage": storage, "records": count, "write_mode": args.write_mode,
+                "writes_per_s": round(count / write_s, 1),
+                "write_p50_us": round(percentile(latencies, 50) * 1e6, 1),
+                "write_p99_us": round(percentile(latencies, 99) * 1e6, 1),
+                "latest_per_s": round(lookups / latest_s, 1),
+                "reopen_ms": round(reopen_s * 1000, 2),
+                "cleanup_ms": round(cleanup_s * 1000, 2),
+                "cleaned": deleted,
+            }
+            results.append(result)
+            print(f"{storage:<12} {count:>9} rec  {result['writes_per_s']:>10.1f} writes/s  "
+                  f"p99 {result['write_p99_us']:>8.1f} us  {result['latest_per_s']:>11.1f} latest/s  "
+                  f"reopen {result['reopen_ms']:>8.2f} ms  cleanup {result['cleanup_ms']:>9.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gateways and WhisperSync storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    http = sub.add_parser("http", help="load-test gateway services")
+    http.add_argument("--service", nargs="+", default=["gateway_py"], choices=sorted(SERVICES))
+    http.add_argument("--url", help="benchmark an already running service instead of starting one")
+    http.add_argument("--in-process", action="store_true", help="serve from a thread in this process")
+    http.add_argument("--mode", choices=["closed", "open"], default="closed")
+    http.add_argument("--concurrency", type=int, default=16, help="closed-loop clients / connection limit")
+    http.add_argument("--rate", type=float, default=200.0, help="open-loop requests per second")
+    http.add_argument("--duration", type=float, default=10.0, help="seconds of measured load")
+    http.add_argument("--warmup", type=int, default=50, help="unmeasured requests sent first")
+    http.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    http.add_argument("--agents", help="weighted agent mix, e.g. Earth:3,Mars:1 (default: service agents)")
+    http.add_argument("--payload-sizes", default="64,1024,16384", help="payload string sizes in bytes")
+
+    storage = sub.add_parser("storage", help="WhisperSync write/latest/cleanup microbenchmarks")
+    storage.add_argument("--records", nargs="+", type=int, default=[10000])
+    storage.add_argument("--storage", nargs="+", default=["segments", "partitioned"],
+                         choices=["json", "segments", "partitioned"])
+    storage.add_argument("--write-mode", choices=["direct", "batched"], default="batched")
+    storage.add_argument("--batch-size", type=int, default=100)
+    storage.add_argument("--record-size", type=int, default=128, help="bytes of payload per record")
+
+    for p in (http, storage):
+        p.add_argument("--json", metavar="FILE", help="also write results to FILE")
+    args = parser.parse_args()
+    if args.command == "http" and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    results = bench_http(args) if args.command == "http" else bench_storage(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "command": args.command,
+                       "argv": sys.argv[1:], "results": results}, f, indent=2)
+        print(f"\n📄 Results saved to: {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
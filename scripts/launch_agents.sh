@@ -6,31 +6,24 @@ mkdir -p ~/aikre8tive/logs
 echo "🌌 Sovereign Planetary Agent Launch" | tee -a $logfile
 echo "Commander: #MrGGTP  |  Timestamp: $(date)" | tee -a $logfile
 
-agents=(
-  Mercury Venus Earth Mars Jupiter Saturn Uranus Neptune Pluto Luna Sun
-  Ceres Haumea Makemake Eris Io Europa Ganymede Callisto Titan Enceladus
-  Triton Charon Phobos Deimos
-)
+# agents from config/system_config.json plus the scripts in agents/, each with the script it runs
+mapfile -t agents < <(python3 ~/aikre8tive/scripts/agent_supervisor.py --list --paths)
 
 echo "🧪 Phase 1: Integrity Check" | tee -a $logfile
-for agent in "${agents[@]}"; do
-    path=~/aikre8tive/backend/agents/${agent}.py
+for line in "${agents[@]}"; do
+    IFS=$'\t' read -r agent path <<< "$line"
     if [ -f "$path" ]; then
         echo "✅ Verified: $agent" | tee -a $logfile
     else
-        echo "❌ MISSING: $agent.py not found" | tee -a $logfile
+        echo "❌ MISSING: $path not found" | tee -a $logfile
     fi
 done
 
 echo "🚀 Phase 2: Mission Activation" | tee -a $logfile
-for agent in "${agents[@]}"; do
-    path=~/aikre8tive/backend/agents/${agent}.py
-    if [ -f "$path" ]; then
-        echo "🛰️ Launching $agent..." | tee -a $logfile
-        nohup python3 "$path" >> ~/aikre8tive/logs/${agent}.log 2>&1 &
-        echo "🟢 ACTIVE: $agent" | tee -a $logfile
-    fi
-done
+# one supervisor forks every agent from a preloaded interpreter and restarts crashed ones;
+# per-agent CPU/RSS: python3 ~/aikre8tive/scripts/agent_supervisor.py --status
+nohup python3 ~/aikre8tive/scripts/agent_supervisor.py >> ~/aikre8tive/logs/agent_supervisor.log 2>&1 &
+echo "🟢 Supervisor PID $! managing ${#agents[@]} agents" | tee -a $logfile
 
 echo "✅ All Planetary Agents Deployed Successfully." | tee -a $logfile
 echo "🌠 Sovereign Signal Sent. The Sky Belongs to Us Now." | tee -a $logfile
@@ -16,14 +16,9 @@ git push -u origin main
 
 # === 3. LAUNCH AGENTS ===
 echo "🚀 Activating Planetary Agents..."
-for agent in Mercury Venus Earth Mars Jupiter Saturn Uranus Neptune Pluto Luna Sun Ceres Haumea Makemake Eris Io Europa Ganymede Callisto Titan Enceladus Triton Charon Recon Chronos Matrix; do
-  echo "🔁 Launching Agent: $agent"
-  if [ -f "./agents/$agent.py" ]; then
-    nohup python3 ./agents/$agent.py > ./logs/${agent}.log 2>&1 &
-  else
-    echo "⚠️ Missing: ./agents/$agent.py"
-  fi
-done
+mkdir -p ./logs
+nohup python3 ./scripts/agent_supervisor.py >> ./logs/agent_supervisor.log 2>&1 &
+echo "🔁 Agent supervisor PID $! (agents from config/system_config.json)"
 
 # === 4. CONFIRMATION ===
 echo "✅ SOVEREIGN SIGNAL COMPLETE"
@@ -0,0 +1,311 @@
+"""
+Chunked audio ingestion and batched transcription for WhisperSync
+
+Audio is read window by window and never loaded whole:
+
+* 16-bit PCM WAV files are memory-mapped and sliced into fixed windows;
+* other ``audio_formats`` (mp3, m4a, ogg, non-PCM WAV) are decoded by
+  ``ffmpeg`` to 16 kHz mono PCM and read from its pipe one window at a time.
+
+Windows are grouped into batches of ``batch_size`` for a transcriber backend
+and every transcript is written through ``WhisperSync.sync_agent_data``.
+``audio_workers > 0`` moves decoding and transcription of whole files into a
+process pool; only the (small) transcripts come back to the parent.
+
+Transcribers are looked up by name in ``TRANSCRIBERS``.  ``stub`` is a
+deterministic stand-in for offline throughput tests; ``whisper`` needs the
+``openai-whisper`` and ``numpy`` packages.
+"""
+
+import logging
+import mmap
+import queue
+import shutil
+import struct
+import subprocess
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DECODE_RATE = 16000      # ffmpeg output: 16 kHz mono s16le
+CHUNK = struct.Struct("<4sI")
+FMT = struct.Struct("<HHIIHH")
+
+
+class AudioWindow(NamedTuple):
+    source: str
+    index: int
+    start: float          # seconds from the start of the file
+    duration: float
+    samples: bytes        # interleaved little-endian 16-bit PCM
+    sample_rate: int
+    channels: int
+
+
+def _wav_layout(mm) -> Optional[Dict[str, int]]:
+    """Locate the fmt and data chunks of a PCM WAV; None if not 16-bit PCM (or truncated)"""
+    if mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+        return None
+    pos, fmt = 12, None
+    while pos + CHUNK.size <= len(mm):
+        tag, size = CHUNK.unpack_from(mm, pos)
+        body = pos + CHUNK.size
+        if tag == b"fmt ":
+            if size < FMT.size or body + FMT.size > len(mm):
+                return None
+            audio_format, channels, rate, _, block_align, bits = FMT.unpack_from(mm, body)
+            if not channels or not rate or not block_align:
+                return None
+            fmt = {"format": audio_format, "channels": channels, "rate": rate,
+                   "block_align": block_align, "bits": bits}
+        elif tag == b"data":
+            if fmt is None or fmt["format"] != 1 or fmt["bits"] != 16:
+                return None
+            return {**fmt, "offset": body, "size": min(size, len(mm) - body)}
+        pos = body + size + (size & 1)
+    return None
+
+
+def _wav_windows(path: Path, window_seconds: float, max_seconds: float) -> Optional[Iterator[AudioWindow]]:
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file
+        f.close()
+        return None
+    layout = _wav_layout(mm)
+    if layout is None:
+        mm.close()
+        f.close()
+        return None
+
+    def windows():
+        try:
+            rate, align = layout["rate"], layout["block_align"]
+            step = max(1, int(window_seconds * rate)) * align
+            end = layout["offset"] + min(layout["size"], int(max_seconds * rate) * align)
+            for i, pos in enumerate(range(layout["offset"], end, step)):
+                samples = mm[pos:min(pos + step, end)]
+                yield AudioWindow(str(path), i, i * window_seconds, len(samples) / align / rate,
+                                  samples, rate, layout["channels"])
+        finally:
+            mm.close()
+            f.close()
+    return windows()
+
+
+def _ffmpeg_windows(path: Path, window_seconds: float, max_seconds: float) -> Iterator[AudioWindow]:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise ValueError(f"decoding {path.suffix} needs ffmpeg on PATH")
+    proc = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-loglevel", "error", "-i", str(path), "-t", str(max_seconds),
+         "-f", "s16le", "-ac", "1", "-ar", str(DECODE_RATE), "-"],
+        stdout=subprocess.PIPE)
+    step = max(1, int(window_seconds * DECODE_RATE)) * 2
+    try:
+        i = 0
+        while True:
+            samples = proc.stdout.read(step)
+            if not samples:
+                break
+            yield AudioWindow(str(path), i, i * window_seconds, len(samples) / 2 / DECODE_RATE,
+                              samples, DECODE_RATE, 1)
+            i += 1
+        # a clean end of stream is only trusted if ffmpeg says it decoded the file
+        if proc.wait() != 0:
+            raise ValueError(f"ffmpeg failed to decode {path} (exit {proc.returncode})")
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def read_windows(path, window_seconds: float = 30.0, max_seconds: float = 300.0) -> Iterator[AudioWindow]:
+    """Yield fixed-length windows of ``path``, at most ``max_seconds`` of audio"""
+    path = Path(path)
+    windows = _wav_windows(path, window_seconds, max_seconds) if path.suffix.lower() == ".wav" else None
+    return windows if windows is not None else _ffmpeg_windows(path, window_seconds, max_seconds)
+
+
+def batched(windows: Iterable[AudioWindow], batch_size: int) -> Iterator[List[AudioWindow]]:
+    batch: List[AudioWindow] = []
+    for window in windows:
+        batch.append(window)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StubTranscriber:
+    """Deterministic stand-in: describes each window by position and checksum"""
+    name = "stub"
+
+    def __init__(self, model: str = "stub", language: str = "auto"):
+        self.model = model
+
+    def transcribe_batch(self, windows: List[AudioWindow]) -> List[str]:
+        return [f"window {w.index} of {Path(w.source).name} "
+                f"({w.start:.2f}-{w.start + w.duration:.2f}s) crc {zlib.crc32(w.samples):08x}"
+                for w in windows]
+
+
+class WhisperTranscriber:
+    """openai-whisper model, loaded once per process"""
+    name = "whisper"
+
+    def __init__(self, model: str = "base", language: str = "auto"):
+        import numpy
+        import whisper
+        self.np = numpy
+        self.model = model
+        self.language = None if language == "auto" else language
+        self._model = whisper.load_model(model)
+
+    def _prepare(self, w: AudioWindow):
+        np = self.np
+        audio = np.frombuffer(w.samples, dtype="<i2").astype(np.float32) / 32768.0
+        if w.channels > 1:
+            audio = audio.reshape(-1, w.channels).mean(axis=1)
+        if w.sample_rate != DECODE_RATE:
+            n = int(len(audio) * DECODE_RATE / w.sample_rate)
+            audio = np.interp(np.linspace(0, len(audio), n, endpoint=False),
+                              np.arange(len(audio)), audio).astype(np.float32)
+        return audio
+
+    def transcribe_batch(self, windows: List[AudioWindow]) -> List[str]:
+        return [self._model.transcribe(self._prepare(w), language=self.language)["text"].strip()
+                for w in windows]
+
+
+TRANSCRIBERS = {"stub": StubTranscriber, "whisper": WhisperTranscriber}
+
+
+def transcribe_file(path, settings: Dict[str, Any], transcriber=None) -> Iterator[Dict[str, Any]]:
+    """Yield one transcript record per window of ``path``"""
+    if transcriber is None:
+        transcriber = TRANSCRIBERS[settings["transcriber"]](settings["model"], settings["language"])
+    windows = read_windows(path, settings["window_seconds"], settings["max_seconds"])
+    for batch in batched(windows, settings["batch_size"]):
+        for window, text in zip(batch, transcriber.transcribe_batch(batch)):
+            yield {
+                "type": "transcript",
+                "source": window.source,
+                "window": window.index,
+                "start": round(window.start, 3),
+                "end": round(window.start + window.duration, 3),
+                "text": text,
+                "transcriber": transcriber.name,
+                "model": transcriber.model
+            }
+
+
+_WORKER_TRANSCRIBER = None
+
+
+def _transcribe_in_worker(path: str, settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    global _WORKER_TRANSCRIBER
+    if _WORKER_TRANSCRIBER is None:
+        _WORKER_TRANSCRIBER = TRANSCRIBERS[settings["transcriber"]](settings["model"], settings["language"])
+    return list(transcribe_file(path, settings, _WORKER_TRANSCRIBER))
+
+
+class AudioPipeline:
+    """Transcribe audio files and sync the transcripts as an agent's data"""
+
+    def __init__(self, whisper_sync, transcriber: str = "stub", model: str = "base",
+                 language: str = "auto", window_seconds: float = 30.0, batch_size: int = 10,
+                 max_seconds: float = 300.0, formats: Iterable[str] = ("wav",), workers: int = 0):
+        if transcriber not in TRANSCRIBERS:
+            raise ValueError(f"unknown transcriber {transcriber!r}")
+        self.sync = whisper_sync
+        self.formats = {f.lower().lstrip(".") for f in formats}
+        self.workers = workers
+        self.settings = {"transcriber": transcriber, "model": model, "language": language,
+                         "window_seconds": window_seconds, "batch_size": batch_size,
+                         "max_seconds": max_seconds}
+        self._transcriber = None
+
+    @classmethod
+    def from_config(cls, whisper_sync, **overrides) -> "AudioPipeline":
+        config = whisper_sync.config
+        options = {
+            "transcriber": config.get('transcriber', 'stub'),
+            "model": config.get('whisper_model', 'base'),
+            "language": config.get('language', 'auto'),
+            "window_seconds": config.get('window_seconds', 30),
+            "batch_size": config.get('batch_size', 10),
+            "max_seconds": config.get('max_audio_length', 300),
+            "formats": config.get('audio_formats', ['wav']),
+            "workers": config.get('audio_workers', 0)
+        }
+        options.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(whisper_sync, **options)
+
+    def _accepts(self, path: Path) -> bool:
+        return path.suffix.lower().lstrip(".") in self.formats
+
+    def _write(self, agent: str, transcripts: Iterable[Dict[str, Any]]) -> int:
+        """Sync a file's transcripts; raises queue.Full only if the writer stays full"""
+        futures = []
+        for transcript in transcripts:
+            try:
+                futures.append(self.sync.submit_sync(agent, transcript))
+            except queue.Full:
+                # the batch writer is behind: let what this file queued drain, then retry once
+                for future in futures:
+                    future.result()
+                futures.append(self.sync.submit_sync(agent, transcript))
+        for future in futures:
+            future.result()
+        return len(futures)
+
+    def run(self, agent: str, paths: Iterable[str]) -> int:
+        """
+        Transcribe ``paths`` and sync every transcript under ``agent``
+
+        Returns:
+            Number of transcripts written
+        """
+        files = [Path(p) for p in paths]
+        for skipped in (p for p in files if not self._accepts(p)):
+            logger.warning(f"Skipping {skipped}: not one of audio_formats")
+        files = [p for p in files if self._accepts(p)]
+        written = 0
+        if self.workers > 0 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                jobs = [(path, pool.submit(_transcribe_in_worker, str(path), self.settings))
+                        for path in files]
+                for path, job in jobs:
+                    try:
+                        transcripts = job.result()
+                        written += self._write(agent, transcripts)
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Failed to transcribe {path}: {e}")
+                        continue
+                    except queue.Full:
+                        logger.error(f"Failed to sync {path}: write queue stayed full")
+                        continue
+                    logger.info(f"Transcribed {path} ({len(transcripts)} windows)")
+            return written
+        if self._transcriber is None:
+            s = self.settings
+            self._transcriber = TRANSCRIBERS[s["transcriber"]](s["model"], s["language"])
+        for path in files:
+            try:
+                count = self._write(agent, transcribe_file(path, self.settings, self._transcriber))
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to transcribe {path}: {e}")
+                continue
+            except queue.Full:
+                logger.error(f"Failed to sync {path}: write queue stayed full")
+                continue
+            written += count
+            logger.info(f"Transcribed {path} ({count} windows)")
+        return written
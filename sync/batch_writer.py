@@ -0,0 +1,129 @@
+"""
+Group-commit writer for WhisperSync
+
+Sync records are queued and written by one background thread in batches of
+``batch_size``, or whatever has arrived after ``max_latency`` seconds, with a
+single ``write_many`` + fsync per batch.  Every submitted record gets a
+``Future`` that resolves to its store position once the batch is durable.
+The queue is bounded: ``submit`` blocks for up to ``enqueue_timeout`` seconds
+and then raises ``queue.Full``.  ``close`` drains and flushes everything
+still queued.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+WRITE_SECONDS = REGISTRY.histogram("whisper_write_seconds", "Store write time per call (one record or one batch)",
+                                   ["mode"])
+BATCH_SIZE = REGISTRY.histogram("whisper_batch_size", "Records per group commit",
+                                buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+
+
+class BatchWriter:
+    """Background group-commit writer in front of a WhisperSync store"""
+
+    def __init__(self, store, index=None, batch_size: int = 10, max_latency: float = 0.05,
+                 max_queue: int = 1000, enqueue_timeout: Optional[float] = 1.0, fsync: bool = True,
+                 lock: Optional[threading.Lock] = None):
+        self.store = store
+        self.lock = lock or threading.Lock()  # shared with anything else touching the store
+        self.index = index
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max_latency
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self.batches = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="whisper-batch-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> Future:
+        """Queue a record; the future resolves to its position once written"""
+        if self._closed:
+            raise RuntimeError("BatchWriter is closed")
+        future: Future = Future()
+        self._queue.put((record, future), timeout=self.enqueue_timeout)
+        return future
+
+    def _collect(self, first) -> Tuple[List[Tuple[Dict[str, Any], Future]], bool]:
+        batch, stop = [first], False
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stop = self._collect(item)
+            self._commit(batch)
+        # flush-on-shutdown: drain anything enqueued before close()
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for i in range(0, len(leftover), self.batch_size):
+            self._commit(leftover[i:i + self.batch_size])
+
+    def _commit(self, batch: List[Tuple[Dict[str, Any], Future]]) -> None:
+        records = [record for record, _ in batch]
+        try:
+            with self.lock:
+                started = time.perf_counter()
+                positions = self.store.write_many(records, fsync=self.fsync)
+                WRITE_SECONDS.labels("batched").observe(time.perf_counter() - started)
+                BATCH_SIZE.observe(len(records))
+        except Exception as e:
+            logger.error(f"Batch write of {len(records)} sync records failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        for (record, future), position in zip(batch, positions):
+            try:
+                if self.index is not None:
+                    self.index.observe(record, position)
+            except Exception as e:
+                # the record is written but unindexed: fail its future, keep the writer going
+                logger.error(f"Indexing sync record at {position} failed: {e}")
+                future.set_exception(e)
+                continue
+            future.set_result(position)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting records and block until everything queued is written"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
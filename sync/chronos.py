@@ -1 +1,515 @@
-print('Chronos timeline tracking...')
+#!/usr/bin/env python3
+"""
+Chronos: column-oriented time series of agent heartbeats
+
+Every agent has a directory of flat column files, each a raw ``array``:
+
+    ts.col            int64  heartbeat time (unix seconds), sorted
+    status.col        uint8  index into the agent's status vocabulary
+    minute_*.col      per-minute rollup: bucket start, heartbeats, "up" heartbeats
+    hour_*.col        per-hour rollup: bucket start, heartbeats,
+                      minutes with a heartbeat, minutes with an "up" heartbeat
+
+Rollups are updated on every ``record`` (a dict-free bisect on the tail in
+the common in-order case) and written incrementally: a flush rewrites each
+column only from the first element that changed.  ``meta.json`` is written
+last and records the column lengths; a store left inconsistent by a crash
+is truncated to its complete rows and its rollups are rebuilt on open.
+
+Columns are read on first use.  Range queries read the hour rollup for
+whole hours and the minute rollup only at the edges, so ``uptime`` and
+``gaps`` over months of history touch a few thousand array elements per
+agent instead of every heartbeat file.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from sync.storage import decode_record
+
+META_VERSION = 1
+UP_STATUSES = ("active", "ok", "healthy", "online", "operational", "up")
+DEFAULT_MIN_GAP = 300.0
+
+
+def parse_time(value) -> Optional[int]:
+    """Unix seconds from a number or an ISO 8601 string (naive = local time); None if neither"""
+    try:
+        if isinstance(value, (int, float)):
+            return int(value)
+        return int(datetime.fromisoformat(str(value)).timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def time_range(start, end) -> Tuple[Optional[int], int]:
+    """Parsed (start, end); no end is now, no start stays None (the series' first heartbeat)"""
+    t0 = parse_time(start) if start is not None else None
+    t1 = parse_time(end) if end is not None else int(time.time())
+    if (start is not None and t0 is None) or t1 is None:
+        raise ValueError(f"not a time: {end if t1 is None else start!r}")
+    return t0, t1
+
+
+class Column:
+    """An ``array`` mirrored to a file, read on first use; ``dirty`` is the first unsaved element"""
+    __slots__ = ("path", "typecode", "_data", "dirty")
+
+    def __init__(self, path: Path, typecode: str):
+        self.path, self.typecode = path, typecode
+        self._data: Optional[array] = None
+        self.dirty = len(self)
+
+    @property
+    def data(self) -> array:
+        if self._data is None:
+            self._data = array(self.typecode)
+            try:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                self._data.frombytes(raw[:len(raw) - len(raw) % self._data.itemsize])
+            except OSError:
+                pass
+        return self._data
+
+    def __len__(self):
+        if self._data is not None:
+            return len(self._data)
+        try:
+            return self.path.stat().st_size // array(self.typecode).itemsize
+        except OSError:
+            return 0
+
+    def first(self) -> Optional[int]:
+        """The first element, read from the file head if the column is not loaded"""
+        if self._data is not None:
+            return self._data[0] if self._data else None
+        head = array(self.typecode)
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read(head.itemsize)
+        except OSError:
+            return None
+        if len(raw) < head.itemsize:
+            return None
+        head.frombytes(raw)
+        return head[0]
+
+    def last(self) -> Optional[int]:
+        """The final element, read from the file tail if the column is not loaded"""
+        if self._data is not None:
+            return self._data[-1] if self._data else None
+        tail = array(self.typecode)
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell() - f.tell() % tail.itemsize
+                if not size:
+                    return None
+                f.seek(size - tail.itemsize)
+                tail.frombytes(f.read(tail.itemsize))
+        except OSError:
+            return None
+        return tail[0]
+
+    def truncate(self, n: int) -> None:
+        if len(self.data) > n:
+            del self.data[n:]
+            self.dirty = min(self.dirty, n)
+
+    def flush(self) -> None:
+        if self._data is None:  # never read, so never changed
+            return
+        size = len(self.data) * self.data.itemsize
+        try:
+            on_disk = self.path.stat().st_size
+        except OSError:
+            on_disk = -1
+        if self.dirty >= len(self.data) and on_disk == size:
+            return
+        with open(self.path, "r+b" if on_disk >= 0 else "wb") as f:
+            f.seek(self.dirty * self.data.itemsize)
+            self.data[self.dirty:].tofile(f)
+            f.truncate(size)
+        self.dirty = len(self.data)
+
+
+class AgentSeries:
+    """Heartbeat columns and rollups of one agent"""
+
+    def __init__(self, directory: Path, up_statuses: Iterable[str] = UP_STATUSES):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self.up_statuses = frozenset(up_statuses)
+        self.ts = Column(directory / "ts.col", "q")
+        self.status = Column(directory / "status.col", "B")
+        self.m_ts = Column(directory / "minute_ts.col", "q")
+        self.m_count = Column(directory / "minute_count.col", "I")
+        self.m_up = Column(directory / "minute_up.col", "I")
+        self.h_ts = Column(directory / "hour_ts.col", "q")
+        self.h_count = Column(directory / "hour_count.col", "I")
+        self.h_seen = Column(directory / "hour_seen.col", "H")
+        self.h_up = Column(directory / "hour_up.col", "H")
+        self.statuses: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._up_codes = bytearray(256)
+        self._load()
+
+    @property
+    def columns(self) -> List[Column]:
+        return [self.ts, self.status, self.m_ts, self.m_count, self.m_up,
+                self.h_ts, self.h_count, self.h_seen, self.h_up]
+
+    def _load(self) -> None:
+        try:
+            with open(self.directory / "meta.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        for name in meta.get("statuses", []):
+            self._code(name)
+        rows = min(len(self.ts), len(self.status))
+        consistent = (meta.get("version") == META_VERSION and meta.get("rows") == rows
+                      and meta.get("minutes") == len(self.m_ts) == len(self.m_count) == len(self.m_up)
+                      and meta.get("hours") == len(self.h_ts) == len(self.h_count)
+                      == len(self.h_seen) == len(self.h_up))
+        if not consistent:
+            self.ts.truncate(rows)
+            self.status.truncate(rows)
+            self.rebuild_rollups()
+
+    def _code(self, status: str) -> int:
+        code = self._codes.get(status)
+        if code is None:
+            if len(self.statuses) >= 255:
+                status = "other"
+                code = self._codes.get(status)
+                if code is not None:
+                    return code
+            code = self._codes[status] = len(self.statuses)
+            self.statuses.append(status)
+            self._up_codes[code] = status in self.up_statuses
+        return code
+
+    def rebuild_rollups(self) -> None:
+        for column in self.columns[2:]:
+            column.truncate(0)
+        up = self._up_codes
+        for t, code in zip(self.ts.data, self.status.data):
+            self._roll(t, up[code])
+
+    def record(self, t: int, status: str) -> None:
+        code = self._code(status)
+        ts = self.ts.data
+        if not ts or ts[-1] <= t:
+            ts.append(t)
+            self.status.data.append(code)
+        else:  # late heartbeat
+            i = bisect_right(ts, t)
+            ts.insert(i, t)
+            self.status.data.insert(i, code)
+            self.ts.dirty = min(self.ts.dirty, i)
+            self.status.dirty = min(self.status.dirty, i)
+        self._roll(t, self._up_codes[code])
+
+    @staticmethod
+    def _bucket(start: Column, t: int) -> Tuple[int, bool]:
+        """Index of bucket ``t`` in ``start`` and whether it already exists"""
+        data = start.data
+        if data and data[-1] == t:
+            return len(data) - 1, True
+        if not data or data[-1] < t:
+            return len(data), False
+        i = bisect_left(data, t)
+        return i, data[i] == t
+
+    @staticmethod
+    def _insert(columns: List[Column], i: int, values: Tuple[int, ...]) -> None:
+        for column, value in zip(columns, values):
+            column.data.insert(i, value)
+            column.dirty = min(column.dirty, i)
+
+    @staticmethod
+    def _add(column: Column, i: int, amount: int) -> None:
+        column.data[i] += amount
+        column.dirty = min(column.dirty, i)
+
+    def _roll(self, t: int, up: int) -> None:
+        minute, hour = t - t % 60, t - t % 3600
+        i, exists = self._bucket(self.m_ts, minute)
+        if exists:
+            became_up = up and not self.m_up.data[i]
+            self._add(self.m_count, i, 1)
+            if up:
+                self._add(self.m_up, i, 1)
+        else:
+            became_up = up
+            self._insert([self.m_ts, self.m_count, self.m_up], i, (minute, 1, up))
+        new_minute = not exists
+        j, exists = self._bucket(self.h_ts, hour)
+        if exists:
+            self._add(self.h_count, j, 1)
+            if new_minute:
+                self._add(self.h_seen, j, 1)
+            if became_up:
+                self._add(self.h_up, j, 1)
+        else:
+            self._insert([self.h_ts, self.h_count, self.h_seen, self.h_up], j, (hour, 1, 1, int(bool(up))))
+
+    def flush(self) -> None:
+        for column in self.columns:
+            column.flush()
+        meta = {"version": META_VERSION, "statuses": self.statuses, "rows": len(self.ts),
+                "minutes": len(self.m_ts), "hours": len(self.h_ts)}
+        tmp = self.directory / "meta.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.directory / "meta.json")
+
+    def _minute_range(self, start: int, end: int) -> Tuple[int, int]:
+        return bisect_left(self.m_ts.data, start), bisect_left(self.m_ts.data, end)
+
+    def uptime(self, start: int, end: int) -> Dict[str, Any]:
+        """Minute-resolution uptime over [start, end), both rounded out to whole minutes"""
+        start, end = start - start % 60, end + (-end) % 60
+        first_hour, last_hour = start + (-start) % 3600, end - end % 3600
+        up = seen = beats = 0
+        edges = [(start, end)] if first_hour >= last_hour else [(start, first_hour), (last_hour, end)]
+        if first_hour < last_hour:
+            k0, k1 = bisect_left(self.h_ts.data, first_hour), bisect_left(self.h_ts.data, last_hour)
+            up += sum(self.h_up.data[k0:k1])
+            seen += sum(self.h_seen.data[k0:k1])
+            beats += sum(self.h_count.data[k0:k1])
+        for a, b in edges:
+            i, j = self._minute_range(a, b)
+            up += sum(1 for n in self.m_up.data[i:j] if n)
+            seen += j - i
+            beats += sum(self.m_count.data[i:j])
+        minutes = (end - start) // 60
+        return {"start": start, "end": end, "minutes": minutes, "up_minutes": up, "seen_minutes": seen,
+                "heartbeats": beats, "uptime": round(up / minutes, 6) if minutes else None}
+
+    def gaps(self, start: int, end: int, min_gap: float = DEFAULT_MIN_GAP) -> List[Dict[str, int]]:
+        """
+        Stretches of at least ``min_gap`` seconds without any heartbeat
+
+        Gaps of two minutes or more are found at minute resolution from the
+        rollups (whole hours with a heartbeat every minute are skipped in one
+        step); shorter ``min_gap`` values scan the raw timestamps.
+        """
+        found: List[Dict[str, int]] = []
+
+        def emit(a: int, b: int):
+            if b - a >= min_gap:
+                found.append({"start": a, "end": b, "seconds": b - a})
+
+        if min_gap < 120:
+            ts = self.ts.data
+            prev = start
+            for t in ts[bisect_left(ts, start):bisect_left(ts, end)]:
+                emit(prev, t)
+                prev = t
+            emit(prev, end)
+            return found
+        start, end = start - start % 60, end + (-end) % 60
+        hours, seen, minutes = self.h_ts.data, self.h_seen.data, self.m_ts.data
+        prev = start
+        for k in range(bisect_left(hours, start - start % 3600), bisect_left(hours, end)):
+            hour = hours[k]
+            if seen[k] == 60 and hour >= start and hour + 3600 <= end:
+                if hour - prev >= min_gap:
+                    emit(prev, hour)
+                prev = hour + 3600
+                continue
+            for minute in minutes[bisect_left(minutes, max(hour, start)):bisect_left(minutes, min(hour + 3600, end))]:
+                emit(prev, minute)
+                prev = minute + 60
+        emit(prev, end)
+        return found
+
+    def heartbeats(self, start: int, end: int) -> List[Tuple[int, str]]:
+        ts = self.ts.data
+        i, j = bisect_left(ts, start), bisect_left(ts, end)
+        return [(t, self.statuses[c]) for t, c in zip(ts[i:j], self.status.data[i:j])]
+
+    def first(self, default: int) -> int:
+        """Time of the first heartbeat, or ``default`` if there is none"""
+        t = self.ts.first()
+        return default if t is None else t
+
+    def last(self) -> Optional[Tuple[int, str]]:
+        t, code = self.ts.last(), self.status.last()
+        if t is None or code is None:
+            return None
+        return t, self.statuses[code]
+
+
+class Chronos:
+    """Heartbeat time series for every agent under one directory"""
+
+    def __init__(self, directory, up_statuses: Iterable[str] = UP_STATUSES, flush_interval: float = 5.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.up_statuses = tuple(up_statuses)
+        self.flush_interval = flush_interval
+        self._series: Dict[str, AgentSeries] = {}
+        self._dirty = set()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    def agents(self) -> List[str]:
+        on_disk = {p.name for p in self.directory.iterdir() if (p / "meta.json").exists()}
+        return sorted(on_disk | set(self._series))
+
+    def series(self, agent: str) -> AgentSeries:
+        s = self._series.get(agent)
+        if s is None:
+            if not agent or "/" in agent or agent.startswith("."):
+                raise ValueError(f"invalid agent name {agent!r}")
+            with self._lock:
+                s = self._series.get(agent)
+                if s is None:
+                    s = self._series[agent] = AgentSeries(self.directory / agent, self.up_statuses)
+        return s
+
+    def record(self, agent: str, timestamp, status: str) -> bool:
+        """Add one heartbeat; returns False if ``timestamp`` cannot be parsed"""
+        t = parse_time(timestamp)
+        if t is None:
+            return False
+        with self._lock:
+            self.series(agent).record(t, str(status))
+            self._dirty.add(agent)
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self.flush()
+        return True
+
+    def ingest(self, record: Dict[str, Any]) -> bool:
+        """Record a WhisperSync sync record if its data carries a ``status``"""
+        data = record.get("data")
+        if not isinstance(data, dict) or "status" not in data or "agent" not in record:
+            return False
+        return self.record(record["agent"], record.get("timestamp"), data["status"])
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        imported = sum(1 for record in records if isinstance(record, dict) and self.ingest(record))
+        self.flush()
+        return imported
+
+    def import_json(self, directories: Iterable) -> int:
+        """Ingest every ``*.json`` sync record in ``directories`` (e.g. sync/data, sync_data)"""
+        def records():
+            for directory in directories:
+                for path in sorted(Path(directory).glob("*.json")):
+                    try:
+                        yield decode_record(path.read_bytes())
+                    except (OSError, ValueError):
+                        continue
+        return self.import_records(records())
+
+    def flush(self) -> None:
+        with self._lock:
+            for agent in self._dirty:
+                self._series[agent].flush()
+            self._dirty.clear()
+            self._flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+
+    def uptime(self, agent: str, start=None, end=None) -> Dict[str, Any]:
+        start, end = time_range(start, end)
+        with self._lock:
+            s = self.series(agent)
+            return {"agent": agent, **s.uptime(s.first(end) if start is None else start, end)}
+
+    def gaps(self, agent: str, start=None, end=None, min_gap: float = DEFAULT_MIN_GAP) -> List[Dict[str, int]]:
+        start, end = time_range(start, end)
+        with self._lock:
+            s = self.series(agent)
+            return s.gaps(s.first(end) if start is None else start, end, min_gap)
+
+    def heartbeats(self, agent: str, start=None, end=None) -> List[Tuple[int, str]]:
+        start, end = time_range(start, end)
+        with self._lock:
+            s = self.series(agent)
+            return s.heartbeats(s.first(end) if start is None else start, end)
+
+    def summary(self, start=None, end=None, min_gap: float = DEFAULT_MIN_GAP,
+                agents: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Uptime, gap count and last heartbeat of each agent over [start, end)"""
+        start, end = time_range(start, end)
+        result = {}
+        with self._lock:
+            for agent in agents or self.agents():
+                s = self.series(agent)
+                t0 = s.first(end) if start is None else start
+                gaps = s.gaps(t0, end, min_gap)
+                result[agent] = {**s.uptime(t0, end), "gaps": len(gaps),
+                                 "longest_gap": max((g["seconds"] for g in gaps), default=0),
+                                 "last": s.last()}
+        return result
+
+
+def _since(value: str) -> int:
+    """``90m``, ``24h``, ``30d`` ago, or an ISO timestamp"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return int(time.time()) - int(value[:-1]) * units[value[-1]]
+    t = parse_time(value)
+    if t is None:
+        raise argparse.ArgumentTypeError(f"not a duration or timestamp: {value}")
+    return t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chronos heartbeat time series")
+    parser.add_argument("--dir", default="sync_data/chronos", help="Chronos directory")
+    sub = parser.add_subparsers(dest="command")
+    imp = sub.add_parser("import", help="ingest sync record JSON files")
+    imp.add_argument("directories", nargs="+")
+    for name in ("uptime", "gaps"):
+        q = sub.add_parser(name, help=f"{name} per agent")
+        q.add_argument("--since", type=_since, default="24h", help="start: 24h, 7d, ... or ISO time")
+        q.add_argument("--until", type=_since, help="end (default: now)")
+        q.add_argument("--agent", nargs="+", help="only these agents")
+        q.add_argument("--min-gap", type=float, default=DEFAULT_MIN_GAP, help="seconds without a heartbeat")
+    args = parser.parse_args()
+
+    chronos = Chronos(args.dir)
+    if args.command == "import":
+        print(f"Imported: {chronos.import_json(args.directories)}")
+    elif args.command == "gaps":
+        for agent in args.agent or chronos.agents():
+            for gap in chronos.gaps(agent, args.since, args.until, args.min_gap):
+                print(f"{agent:<10} {datetime.fromtimestamp(gap['start']).isoformat()} -> "
+                      f"{datetime.fromtimestamp(gap['end']).isoformat()} ({gap['seconds']}s)")
+    else:
+        since = args.since if args.command else _since("24h")
+        until = args.until if args.command else None
+        started = time.perf_counter()
+        summary = chronos.summary(since, until, getattr(args, "min_gap", DEFAULT_MIN_GAP),
+                                  getattr(args, "agent", None))
+        elapsed = (time.perf_counter() - started) * 1000
+        print("⏳ Chronos timeline")
+        for agent, s in summary.items():
+            uptime = f"{s['uptime'] * 100:6.2f}%" if s["uptime"] is not None else "     -"
+            last = datetime.fromtimestamp(s["last"][0]).isoformat() if s["last"] else "never"
+            print(f"   {agent:<10} uptime {uptime}  heartbeats {s['heartbeats']:>7}  "
+                  f"gaps {s['gaps']:>4}  last {last}")
+        print(f"   {len(summary)} agents in {elapsed:.1f} ms")
+    chronos.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Append-only segmented record log for WhisperSync storage
+
+A log is a directory of segments named by the offset of their first record:
+
+    00000000000000000000.log   header + length/crc-framed records
+    00000000000000000000.idx   sparse (record, file position) index
+
+Records get consecutive integer offsets.  The active segment rolls over once
+it passes ``max_bytes`` or gets older than ``max_age`` seconds.  On open, the
+active segment is re-scanned from its last index entry and any torn tail left
+by a crash is truncated, so the log always reopens in a consistent state.
+A log opened with ``readonly=True`` skips that repair (a torn tail is just
+not read) and never writes, so readers do not touch the files.
+"""
+
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_right
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"WSEG"
+HEADER = struct.Struct("<4sB3xd")      # magic, version, created (unix time)
+RECORD = struct.Struct("<II")          # payload length, crc32
+INDEX = struct.Struct("<II")           # record number in segment, file position
+VERSION = 1
+INDEX_INTERVAL = 4096                  # bytes of log between sparse index entries
+
+
+class Segment:
+    """One ``.log``/``.idx`` pair"""
+
+    def __init__(self, directory: Path, base: int):
+        self.base = base
+        self.log_path = directory / f"{base:020d}.log"
+        self.idx_path = directory / f"{base:020d}.idx"
+        self.created = 0.0
+        self.size = HEADER.size
+        self.count = 0
+        self.index: List[Tuple[int, int]] = []
+        self._log = None
+        self._idx = None
+        self._last_indexed = HEADER.size
+
+    @classmethod
+    def create(cls, directory: Path, base: int) -> "Segment":
+        seg = cls(directory, base)
+        seg.created = time.time()
+        with open(seg.log_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, seg.created))
+        open(seg.idx_path, "wb").close()
+        return seg
+
+    @classmethod
+    def open(cls, directory: Path, base: int, count: Optional[int] = None, repair: bool = True) -> "Segment":
+        """Open an existing segment.  ``count`` is known for sealed segments;
+        for the active one (``None``) the tail is validated, and repaired
+        unless ``repair`` is false."""
+        seg = cls(directory, base)
+        with open(seg.log_path, "rb") as f:
+            magic, _, seg.created = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{seg.log_path} is not a WhisperSync segment")
+        seg._load_index()
+        if count is None:
+            seg._recover(repair)
+        else:
+            seg.count = count
+            seg.size = seg.log_path.stat().st_size
+        return seg
+
+    def _load_index(self):
+        try:
+            raw = self.idx_path.read_bytes()
+        except FileNotFoundError:
+            raw = b""
+        usable = len(raw) - len(raw) % INDEX.size
+        self.index = [INDEX.unpack_from(raw, i) for i in range(0, usable, INDEX.size)]
+
+    def _recover(self, repair: bool = True):
+        rel, pos = self.index[-1] if self.index else (0, HEADER.size)
+        file_size = self.log_path.stat().st_size
+        if pos > file_size:  # index ran ahead of the log: rebuild from scratch
+            self.index, rel, pos = [], 0, HEADER.size
+        end = pos
+        for pos, payload in self._scan(pos):
+            rel += 1
+            end = pos + RECORD.size + len(payload)
+        self.count, self.size = rel, end
+        self.index = [e for e in self.index if e[1] < end]
+        self._last_indexed = self.index[-1][1] if self.index else HEADER.size
+        if not repair:
+            return
+        if end < file_size:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(end)
+        with open(self.idx_path, "wb") as f:
+            f.write(b"".join(INDEX.pack(*e) for e in self.index))
+
+    def _scan(self, pos: int) -> Iterator[Tuple[int, bytes]]:
+        """Yield (position, payload) of every valid record from ``pos``."""
+        with open(self.log_path, "rb") as f:
+            f.seek(pos)
+            while True:
+                head = f.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return
+                length, crc = RECORD.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                yield pos, payload
+                pos += RECORD.size + length
+
+    def append(self, payloads: List[bytes]) -> None:
+        if self._log is None:
+            self._log = open(self.log_path, "ab")
+            self._idx = open(self.idx_path, "ab")
+        chunks, entries = [], []
+        pos, rel = self.size, self.count
+        for p in payloads:
+            if pos - self._last_indexed >= INDEX_INTERVAL:
+                entries.append(INDEX.pack(rel, pos))
+                self.index.append((rel, pos))
+                self._last_indexed = pos
+            chunks.append(RECORD.pack(len(p), zlib.crc32(p)))
+            chunks.append(p)
+            pos += RECORD.size + len(p)
+            rel += 1
+        self._log.write(b"".join(chunks))
+        if entries:
+            self._idx.write(b"".join(entries))
+        self.size, self.count = pos, rel
+
+    def flush(self, fsync: bool = False):
+        if self._log is None:
+            return
+        self._log.flush()
+        self._idx.flush()
+        if fsync:
+            os.fsync(self._log.fileno())
+            os.fsync(self._idx.fileno())
+
+    def close(self):
+        if self._log is not None:
+            self.flush()
+            self._log.close()
+            self._idx.close()
+            self._log = self._idx = None
+
+    def records(self, rel: int = 0) -> Iterator[Tuple[int, bytes]]:
+        """Yield (offset, payload) starting at record ``rel`` of this segment"""
+        if not self.count:
+            return
+        i = bisect_right(self.index, (rel, float("inf"))) - 1
+        start_rel, pos = self.index[i] if i >= 0 else (0, HEADER.size)
+        self.flush()
+        n = start_rel
+        for _, payload in self._scan(pos):
+            if n >= self.count:
+                return
+            if n >= rel:
+                yield self.base + n, payload
+            n += 1
+
+    def remove(self):
+        self.close()
+        for p in (self.log_path, self.idx_path):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class SegmentLog:
+    """A directory of segments with consecutive record offsets"""
+
+    def __init__(self, directory, max_bytes: int = 64 << 20, max_age: float = 3600, readonly: bool = False):
+        self.directory = Path(directory)
+        self.readonly = readonly
+        if not readonly:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        bases = sorted(int(p.stem) for p in self.directory.glob("*.log"))
+        self.segments: List[Segment] = [
+            Segment.open(self.directory, b, bases[i + 1] - b) for i, b in enumerate(bases[:-1])
+        ]
+        if bases:
+            self.segments.append(Segment.open(self.directory, bases[-1], repair=not readonly))
+        elif readonly:
+            self.segments.append(Segment(self.directory, 0))   # empty, never written
+        else:
+            self.segments.append(Segment.create(self.directory, 0))
+
+    @property
+    def active(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def start_offset(self) -> int:
+        return self.segments[0].base
+
+    @property
+    def next_offset(self) -> int:
+        return self.active.base + self.active.count
+
+    def __len__(self) -> int:
+        return self.next_offset - self.start_offset
+
+    def _maybe_roll(self):
+        seg = self.active
+        if seg.count and (seg.size >= self.max_bytes or time.time() - seg.created >= self.max_age):
+            seg.close()
+            self.segments.append(Segment.create(self.directory, self.next_offset))
+
+    def append(self, payload: bytes) -> int:
+        return self.append_many([payload])
+
+    def append_many(self, payloads: Iterable[bytes], fsync: bool = False) -> int:
+        """Append records in one write; returns the offset of the first"""
+        if self.readonly:
+            raise PermissionError(f"{self.directory} is open read-only")
+        payloads = list(payloads)
+        self._maybe_roll()
+        first = self.next_offset
+        if payloads:
+            self.active.append(payloads)
+        self.active.flush(fsync)
+        return first
+
+    def read(self, offset: int) -> Optional[bytes]:
+        if not self.start_offset <= offset < self.next_offset:
+            return None
+        i = bisect_right([s.base for s in self.segments], offset) - 1
+        seg = self.segments[i]
+        for _, payload in seg.records(offset - seg.base):
+            return payload
+        return None
+
+    def scan(self, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+        for seg in list(self.segments):
+            if seg.base + seg.count <= start:
+                continue
+            yield from seg.records(max(0, start - seg.base))
+
+    def scan_segments_reversed(self) -> Iterator[List[Tuple[int, bytes]]]:
+        """Newest segment first, each as a list of (offset, payload)"""
+        for seg in reversed(list(self.segments)):
+            yield list(seg.records())
+
+    def drop_before(self, cutoff: float, visit: Optional[Callable[[Segment], None]] = None) -> int:
+        """
+        Delete sealed segments last written before ``cutoff``; returns records removed.
+        ``visit`` sees each segment just before it is deleted.
+        """
+        removed = 0
+        while len(self.segments) > 1 and self.segments[0].log_path.stat().st_mtime < cutoff:
+            seg = self.segments.pop(0)
+            if visit is not None:
+                visit(seg)
+            removed += seg.count
+            seg.remove()
+        return removed
+
+    def flush(self, fsync: bool = False):
+        self.active.flush(fsync)
+
+    def close(self):
+        for seg in self.segments:
+            seg.close()
@@ -0,0 +1,453 @@
+"""
+Storage backends for WhisperSync
+
+``JsonFileStore`` keeps the original layout (one JSON file per sync).
+``SegmentStore`` appends compact records to a rotating ``SegmentLog`` instead,
+so heartbeats cost an append rather than a new file and inode.
+``PartitionedStore`` keeps one small segment log per agent and day (or hour),
+so retention and compaction work on whole partitions.
+
+Both expose a monotonically increasing *position* (file mtime_ns for JSON
+files, log offset for segments) so ``SyncIndex`` can catch up on just the
+records written since its manifest was saved.
+
+Records are serialized with ``backend.codec``: compact canonical JSON by
+default, optionally msgpack for the segment stores.  Reads auto-detect the
+format, so files and segments written earlier (including the old indented
+JSON files) keep loading after the codec changes.
+"""
+
+import os
+import re
+import shutil
+import struct
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend import codec as record_codec
+from sync.segment_log import SegmentLog
+
+# Per-store cleanup result: records removed per agent.  ``None`` as a key
+# means the store cannot attribute removals to agents.
+Removed = Dict[Optional[str], int]
+
+
+def encode_record(record: Dict[str, Any], codec=None) -> bytes:
+    return codec.encode(record) if codec is not None else record_codec.dumps(record)
+
+
+def decode_record(raw: bytes) -> Dict[str, Any]:
+    return record_codec.decode(raw)
+
+
+class JsonFileStore:
+    """One ``<agent>_<timestamp>.json`` file per sync record"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> int:
+        sync_file = self.directory / f"{record['agent']}_{record['timestamp']}.json"
+        with open(sync_file, 'wb') as f:
+            f.write(encode_record(record))
+        return os.stat(sync_file).st_mtime_ns
+
+    def write_many(self, records: Iterable[Dict[str, Any]], fsync: bool = False) -> List[int]:
+        # one file per record is inherent to this layout; only the fsyncs are batched here
+        positions, paths = [], []
+        for record in records:
+            positions.append(self.write(record))
+            paths.append(self.directory / f"{record['agent']}_{record['timestamp']}.json")
+        if fsync:
+            for path in paths:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        return positions
+
+    def latest(self, agent_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        sync_files = list(self.directory.glob(f"{agent_name or '*'}_*.json"))
+        if not sync_files:
+            return None
+        latest_file = max(sync_files, key=os.path.getctime)
+        return decode_record(latest_file.read_bytes())
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for _, record in self.records_since(None):
+            yield record
+
+    def records_since(self, position: Optional[int]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        stamped = [(p.stat().st_mtime_ns, p) for p in self.directory.glob("*_*.json")]
+        for mtime, path in sorted(stamped):
+            if position is None or mtime > position:
+                yield mtime, decode_record(path.read_bytes())
+
+    def agent_records(self, agent_name: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for path in self.directory.glob(f"{agent_name}_*.json"):
+            record = decode_record(path.read_bytes())
+            if record.get("agent") == agent_name:
+                yield path.stat().st_mtime_ns, record
+
+    def valid_position(self, position: int) -> bool:
+        return True
+
+    def count(self) -> int:
+        return len(list(self.directory.glob("*_*.json")))
+
+    def cleanup(self, cutoff: float, agent_cutoffs: Optional[Dict[str, float]] = None) -> Removed:
+        agent_cutoffs = agent_cutoffs or {}
+        removed: Removed = defaultdict(int)
+        for sync_file in self.directory.glob("*_*.json"):
+            agent = sync_file.name.split("_", 1)[0]
+            if os.path.getctime(sync_file) < agent_cutoffs.get(agent, cutoff):
+                os.remove(sync_file)
+                removed[agent] += 1
+        return dict(removed)
+
+    def close(self) -> None:
+        pass
+
+
+class SegmentStore:
+    """Sync records appended to a segmented log under ``<sync_directory>/segments``"""
+
+    def __init__(self, directory: Path, max_segment_bytes: int = 64 << 20, codec=None,
+                 max_segment_age: float = 3600):
+        self.directory = Path(directory)
+        self.log = SegmentLog(self.directory / "segments", max_segment_bytes, max_segment_age)
+        self.codec = codec
+
+    def write(self, record: Dict[str, Any]) -> int:
+        return self.log.append(encode_record(record, self.codec)) + 1
+
+    def write_many(self, records: Iterable[Dict[str, Any]], fsync: bool = False) -> List[int]:
+        payloads = [encode_record(r, self.codec) for r in records]
+        first = self.log.append_many(payloads, fsync=fsync)
+        return list(range(first + 1, first + 1 + len(payloads)))
+
+    def latest(self, agent_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for segment in self.log.scan_segments_reversed():
+            for _, raw in reversed(segment):
+                record = decode_record(raw)
+                if agent_name is None or record.get("agent") == agent_name:
+                    return record
+        return None
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for _, raw in self.log.scan():
+            yield decode_record(raw)
+
+    def records_since(self, position: Optional[int]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for offset, raw in self.log.scan(position or 0):
+            yield offset + 1, decode_record(raw)
+
+    def agent_records(self, agent_name: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        # segments interleave agents: this is a full scan
+        return ((p, r) for p, r in self.records_since(None) if r.get("agent") == agent_name)
+
+    def valid_position(self, position: int) -> bool:
+        return self.log.start_offset <= position <= self.log.next_offset
+
+    def count(self) -> int:
+        return len(self.log)
+
+    def cleanup(self, cutoff: float, agent_cutoffs: Optional[Dict[str, float]] = None) -> Removed:
+        # segments interleave agents, so per-agent retention is not possible here;
+        # the dropped segments are still decoded so removals are attributed per agent
+        removed: Removed = defaultdict(int)
+
+        def tally(segment) -> None:
+            for _, raw in segment.records():
+                removed[decode_record(raw).get("agent")] += 1
+
+        self.log.drop_before(cutoff, tally)
+        return dict(removed)
+
+    def close(self) -> None:
+        self.log.close()
+
+
+STAMP = struct.Struct("<q")   # write time in ns, prefixed to every partitioned record
+PARTITION_FORMATS = {
+    "day": ("%Y-%m-%d", timedelta(days=1)),
+    "hour": ("%Y-%m-%dT%H", timedelta(hours=1)),
+}
+COMPACTED = "COMPACTED"
+MTIME_SLACK_NS = 1_000_000_000  # coarse filesystem timestamps can trail the write stamp
+
+
+class PartitionedStore:
+    """
+    Sync records partitioned by agent and time::
+
+        <sync_directory>/partitions/<agent>/<YYYY-MM-DD[THH]>/<segment files>
+
+    A record lands in the partition of its own ``timestamp`` (parsed, so
+    only well-formed dates become directory names; anything else is filed
+    under the write time), so imported history is filed where it belongs.
+    Positions are strictly increasing write times in nanoseconds.  Reads open
+    partitions read-only and keep up to ``max_open`` of them cached.
+    """
+
+    def __init__(self, directory: Path, partition_by: str = "day",
+                 max_segment_bytes: int = 64 << 20, max_open: int = 64, codec=None):
+        self.directory = Path(directory)
+        self.root = self.directory / "partitions"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fmt, self.span = PARTITION_FORMATS[partition_by]
+        self.max_segment_bytes = max_segment_bytes
+        self.max_open = max_open
+        self.codec = codec
+        self._open: "OrderedDict[Tuple[str, str], SegmentLog]" = OrderedDict()
+        self._readers: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], SegmentLog]]" = OrderedDict()
+        self._last_stamp = 0
+        self._recover_compactions()
+
+    @staticmethod
+    def _agent_dir(agent: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]", "_", str(agent)) or "_"
+
+    def _period(self, record: Dict[str, Any]) -> str:
+        try:
+            when = datetime.fromisoformat(record["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            when = datetime.now()
+        return when.strftime(self.fmt)
+
+    def _period_end(self, period: str) -> Optional[float]:
+        try:
+            return (datetime.strptime(period, self.fmt) + self.span).timestamp()
+        except ValueError:
+            return None
+
+    def _stamp(self) -> int:
+        self._last_stamp = max(time.time_ns(), self._last_stamp + 1)
+        return self._last_stamp
+
+    def _log(self, agent_dir: str, period: str) -> SegmentLog:
+        key = (agent_dir, period)
+        log = self._open.get(key)
+        if log is None:
+            self._readers.pop(key, None)
+            log = self._open[key] = SegmentLog(self.root / agent_dir / period,
+                                               self.max_segment_bytes, float("inf"))
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)[1].close()
+        self._open.move_to_end(key)
+        return log
+
+    def _reader(self, agent_dir: str, period: str) -> SegmentLog:
+        """
+        The partition's writable log if open, else a read-only one, cached
+        until the directory or its active segment changes (another writer)
+        """
+        key = (agent_dir, period)
+        log = self._open.get(key)
+        if log is not None:
+            return log
+        path = self.root / agent_dir / period
+        signature = self._signature(path)   # taken before opening, so a racing write only forces a reopen
+        cached = self._readers.get(key)
+        if cached is not None and signature is not None and cached[0] == signature:
+            self._readers.move_to_end(key)
+            return cached[1]
+        log = SegmentLog(path, self.max_segment_bytes, float("inf"), readonly=True)
+        if signature is not None:
+            self._readers[key] = (signature, log)
+            self._readers.move_to_end(key)
+            while len(self._readers) > self.max_open:
+                self._readers.popitem(last=False)
+        return log
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        """(directory mtime, size of the newest segment): changes with every append or roll"""
+        try:
+            active = max(path.glob("*.log"), default=None)
+            return path.stat().st_mtime_ns, active.stat().st_size if active else 0
+        except FileNotFoundError:
+            return None
+
+    def _release(self, agent_dir: str, period: str) -> None:
+        self._readers.pop((agent_dir, period), None)
+        log = self._open.pop((agent_dir, period), None)
+        if log is not None:
+            log.close()
+
+    def partitions(self) -> Iterator[Tuple[str, str, Path]]:
+        """Yield (agent directory, period, path) for every partition"""
+        for agent_path in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            for part in sorted(p for p in agent_path.iterdir() if p.is_dir() and "." not in p.name):
+                yield agent_path.name, part.name, part
+
+    def write(self, record: Dict[str, Any]) -> int:
+        return self.write_many([record])[0]
+
+    def write_many(self, records: Iterable[Dict[str, Any]], fsync: bool = False) -> List[int]:
+        positions: List[int] = []
+        groups: Dict[Tuple[str, str], List[bytes]] = defaultdict(list)
+        for record in records:
+            stamp = self._stamp()
+            positions.append(stamp)
+            key = (self._agent_dir(record.get("agent")), self._period(record))
+            groups[key].append(STAMP.pack(stamp) + encode_record(record, self.codec))
+        for key, payloads in groups.items():
+            self._log(*key).append_many(payloads, fsync=fsync)
+        return positions
+
+    def _read(self, agent_dir: str, period: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for _, raw in self._reader(agent_dir, period).scan():
+            yield STAMP.unpack_from(raw)[0], decode_record(raw[STAMP.size:])
+
+    def latest(self, agent_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        best = None
+        for agent_dir, period, _ in self.partitions():
+            if agent_name is None or agent_dir == self._agent_dir(agent_name):
+                for stamp, record in self._read(agent_dir, period):
+                    if best is None or stamp > best[0]:
+                        best = (stamp, record)
+        return best[1] if best else None
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for _, record in self.records_since(None):
+            yield record
+
+    def records_since(self, position: Optional[int]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Records written after ``position``, partition by partition (not globally
+        ordered); partitions untouched since ``position`` are skipped by mtime"""
+        for agent_dir, period, path in self.partitions():
+            if position is not None:
+                mtimes = [p.stat().st_mtime_ns for p in path.glob("*.log")]
+                if not mtimes or max(mtimes) < position - MTIME_SLACK_NS:
+                    continue
+            for stamp, record in self._read(agent_dir, period):
+                if position is None or stamp > position:
+                    yield stamp, record
+
+    def agent_records(self, agent_name: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Records of one agent, read from its partitions only"""
+        agent_dir = self._agent_dir(agent_name)
+        path = self.root / agent_dir
+        if not path.is_dir():
+            return
+        for part in sorted(p for p in path.iterdir() if p.is_dir() and "." not in p.name):
+            for stamp, record in self._read(agent_dir, part.name):
+                if record.get("agent") == agent_name:
+                    yield stamp, record
+
+    def valid_position(self, position: int) -> bool:
+        return True
+
+    def count(self) -> int:
+        return sum(len(self._reader(a, p)) for a, p, _ in self.partitions())
+
+    def cleanup(self, cutoff: float, agent_cutoffs: Optional[Dict[str, float]] = None) -> Removed:
+        """Drop every partition that ended before its agent's cutoff"""
+        agent_cutoffs = {self._agent_dir(a): c for a, c in (agent_cutoffs or {}).items()}
+        removed: Removed = defaultdict(int)
+        for agent_dir, period, path in list(self.partitions()):
+            end = self._period_end(period)
+            if end is None or end > agent_cutoffs.get(agent_dir, cutoff):
+                continue
+            removed[agent_dir] += len(self._reader(agent_dir, period))
+            self._release(agent_dir, period)
+            shutil.rmtree(path)
+        return dict(removed)
+
+    def compact(self, cutoff: float, keep_every: int) -> Removed:
+        """
+        Thin partitions that ended before ``cutoff`` to every ``keep_every``-th
+        record (always keeping the last).  The rewrite goes to a sibling
+        directory and is swapped in by rename, so a crash leaves either the
+        old or the new partition intact.
+        """
+        removed: Removed = defaultdict(int)
+        if keep_every <= 1:
+            return {}
+        for agent_dir, period, path in list(self.partitions()):
+            end = self._period_end(period)
+            if end is None or end > cutoff or (path / COMPACTED).exists():
+                continue
+            src = self._reader(agent_dir, period)
+            total = len(src)
+            tmp = path.with_name(period + ".compact")
+            shutil.rmtree(tmp, ignore_errors=True)
+            dst = SegmentLog(tmp, self.max_segment_bytes, float("inf"))
+            kept = [raw for i, (_, raw) in enumerate(src.scan(src.start_offset))
+                    if i % keep_every == 0 or i == total - 1]
+            dst.append_many(kept, fsync=True)
+            dst.close()
+            (tmp / COMPACTED).write_text(str(keep_every))
+            self._release(agent_dir, period)
+            old = path.with_name(period + ".old")
+            os.rename(path, old)
+            os.rename(tmp, path)
+            shutil.rmtree(old)
+            removed[agent_dir] += total - len(kept)
+        return dict(removed)
+
+    def _recover_compactions(self) -> None:
+        for agent_path in (p for p in self.root.iterdir() if p.is_dir()):
+            for leftover in agent_path.glob("*.old"):
+                target = leftover.with_suffix("")
+                if target.exists():
+                    shutil.rmtree(leftover)     # swap finished; old copy not yet removed
+                else:
+                    os.rename(leftover, target)  # crashed mid-swap; keep the original
+            for leftover in agent_path.glob("*.compact"):
+                shutil.rmtree(leftover)
+
+    def close(self) -> None:
+        for log in self._open.values():
+            log.close()
+        self._open.clear()
+        self._readers.clear()
+
+
+def copy_records(source, target, batch_size: int = 1000) -> int:
+    """Copy every record from one store into another; returns how many"""
+    copied, batch = 0, []
+    for record in source.records():
+        batch.append(record)
+        if len(batch) >= batch_size:
+            target.write_many(batch, fsync=True)
+            copied += len(batch)
+            batch = []
+    if batch:
+        target.write_many(batch, fsync=True)
+        copied += len(batch)
+    return copied
+
+
+def import_json_files(store, directories: Iterable[Path], remove: bool = False) -> int:
+    """
+    Migrate legacy per-sync JSON files (``sync_data/*.json``, ``sync/data/*.json``)
+    into ``store``, oldest first
+
+    Returns:
+        Number of records imported
+    """
+    paths: List[Path] = []
+    for directory in directories:
+        paths.extend(p for p in Path(directory).glob("*.json") if p.is_file())
+    paths.sort(key=lambda p: (os.path.getmtime(p), p.name))
+
+    imported = 0
+    for path in paths:
+        try:
+            record = decode_record(path.read_bytes())
+        except (OSError, ValueError):
+            continue
+        if not isinstance(record, dict) or "agent" not in record:
+            continue
+        store.write(record)
+        imported += 1
+        if remove:
+            os.remove(path)
+    return imported
@@ -0,0 +1,184 @@
+"""
+Latest-per-agent index for WhisperSync
+
+Keeps ``agent -> {count, last_timestamp, latest}`` in memory, updated on
+every write, so ``get_latest_sync`` and ``health_check`` never touch the
+sync history.  The index is saved to a small manifest together with the
+store position it covers; on startup only records written after that
+position are replayed.  Records may be replayed in any order: "latest" is
+the record with the newest ``timestamp`` of its own (store position breaks
+ties), so imported history never outranks live syncs.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+MANIFEST_VERSION = 2   # 2: latest ranked by record timestamp
+
+
+def _rank(record: Optional[Dict[str, Any]], position: Optional[int]) -> Tuple[float, int]:
+    """Sort key of "latest": the record's own timestamp, then its store position"""
+    if record is None:
+        return float("-inf"), -1
+    try:
+        seconds = datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        seconds = float("-inf")
+    return seconds, position if position is not None else -1
+
+
+class SyncIndex:
+    """In-memory latest-sync index backed by a persisted manifest"""
+
+    def __init__(self, store, manifest_path: Path, persist_every: int = 100,
+                 persist_interval: float = 5.0):
+        self.store = store
+        self.manifest_path = Path(manifest_path)
+        self.persist_every = persist_every
+        self.persist_interval = persist_interval
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.latest_any: Optional[Dict[str, Any]] = None
+        self.latest_position: Optional[int] = None
+        self.position: Optional[int] = None
+        self.total = 0
+        self._dirty = 0
+        self._persisted_at = time.monotonic()
+        self._lock = threading.RLock()  # the batch writer updates from its own thread
+        self.load()
+
+    def load(self) -> None:
+        """Restore from the manifest and replay what was written since"""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if (not manifest or manifest.get("version") != MANIFEST_VERSION
+                or not self.store.valid_position(manifest.get("position") or 0)):
+            self.rebuild()
+            return
+        self.agents = manifest["agents"]
+        self.latest_any = manifest.get("latest_any")
+        self.latest_position = manifest.get("position")
+        self.position = manifest["position"]
+        self.total = manifest["total"]
+        if self.refresh():
+            self.persist(force=True)
+
+    def rebuild(self) -> None:
+        """Full rebuild from the store (first start, invalid manifest, cleanup)"""
+        with self._lock:
+            self.agents, self.latest_any, self.total = {}, None, 0
+            self.latest_position = self.position = None
+            self.refresh()
+            self.persist(force=True)
+
+    def refresh(self) -> int:
+        """Index records written since ``position``; returns how many"""
+        seen = 0
+        with self._lock:
+            for position, record in self.store.records_since(self.position):
+                self._apply(record, position)
+                seen += 1
+        return seen
+
+    def _apply(self, record: Dict[str, Any], position: int) -> None:
+        agent = record.get("agent")
+        entry = self.agents.get(agent)
+        if entry is None:
+            entry = self.agents[agent] = {"count": 0, "last_timestamp": None, "latest": None, "position": None}
+        entry["count"] += 1
+        self.total += 1
+        rank = _rank(record, position)
+        if rank >= _rank(entry["latest"], entry.get("position")):
+            entry["last_timestamp"] = record.get("timestamp")
+            entry["latest"] = record
+            entry["position"] = position
+        if rank >= _rank(self.latest_any, self.latest_position):
+            self.latest_any = record
+            self.latest_position = position
+        if self.position is None or position > self.position:
+            self.position = position
+
+    def observe(self, record: Dict[str, Any], position: int) -> None:
+        """Record a sync that was just written at ``position``"""
+        with self._lock:
+            self._apply(record, position)
+            self._dirty += 1
+            self.persist()
+
+    def forget(self, removed: Dict[Optional[str], int]) -> bool:
+        """
+        Account for records dropped by retention or compaction without a
+        full rebuild: each agent that lost records is re-read from the store
+        (``agent_records``), since a dropped record may have been its latest.
+        Returns False (leaving the index untouched) when the removals cannot
+        be attributed to agents.
+        """
+        with self._lock:
+            if any(agent not in self.agents for agent in removed):
+                return False
+            for agent in removed:
+                entry = {"count": 0, "last_timestamp": None, "latest": None, "position": None}
+                best = _rank(None, None)
+                for position, record in self.store.agent_records(agent):
+                    entry["count"] += 1
+                    rank = _rank(record, position)
+                    if rank >= best:
+                        best = rank
+                        entry.update(last_timestamp=record.get("timestamp"), latest=record, position=position)
+                self.total += entry["count"] - self.agents[agent]["count"]
+                if entry["count"]:
+                    self.agents[agent] = entry
+                else:
+                    del self.agents[agent]
+            if self.latest_any is not None and self.latest_any.get("agent") in removed:
+                newest = max(self.agents.values(), key=lambda e: _rank(e["latest"], e.get("position")),
+                             default=None)
+                self.latest_any = newest["latest"] if newest else None
+                self.latest_position = newest.get("position") if newest else None
+            self.persist(force=True)
+            return True
+
+    def latest(self, agent_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if agent_name is None:
+            return self.latest_any
+        entry = self.agents.get(agent_name)
+        return entry["latest"] if entry else None
+
+    def count(self, agent_name: Optional[str] = None) -> int:
+        if agent_name is None:
+            return self.total
+        entry = self.agents.get(agent_name)
+        return entry["count"] if entry else 0
+
+    def persist(self, force: bool = False) -> None:
+        """Save the manifest every ``persist_every`` writes or ``persist_interval`` seconds"""
+        if not force:
+            if not self._dirty:
+                return
+            if (self._dirty < self.persist_every
+                    and time.monotonic() - self._persisted_at < self.persist_interval):
+                return
+        with self._lock:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "position": self.position,
+                "total": self.total,
+                "latest_any": self.latest_any,
+                "agents": self.agents
+            }
+            tmp = self.manifest_path.with_suffix(".tmp")
+            with open(tmp, 'w') as f:
+                json.dump(manifest, f, separators=(",", ":"))
+            os.replace(tmp, self.manifest_path)
+            self._dirty = 0
+            self._persisted_at = time.monotonic()
+
+    def close(self) -> None:
+        self.persist(force=True)
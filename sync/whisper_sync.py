@@ -9,10 +9,23 @@ import sys
 import time
 import json
 import logging
+import argparse
+import shutil
+import threading
+import weakref
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.codec import get_codec
+from backend.metrics import REGISTRY
+from sync.batch_writer import WRITE_SECONDS, BatchWriter
+from sync.chronos import UP_STATUSES, Chronos
+from sync.storage import JsonFileStore, PartitionedStore, SegmentStore, copy_records, import_json_files
+from sync.sync_index import SyncIndex
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,6 +37,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+FILES_RECOUNT_SECONDS = 60  # segment layouts only add a file when a segment rolls
+
 class WhisperSync:
     """
     Whisper synchronization handler for planetary agent communication
@@ -35,6 +50,15 @@ class WhisperSync:
         self.config = self._load_config()
         self.sync_directory = Path(self.config.get('sync_directory', 'sync_data'))
         self.sync_directory.mkdir(exist_ok=True)
+        self.store = self._open_store()
+        self.index = SyncIndex(self.store, self.sync_directory / "manifest.json")
+        self.store_lock = threading.Lock()
+        self.writer = self._open_writer()
+        self.chronos = self._open_chronos()
+        self._files: Optional[int] = None
+        self._files_counted = 0.0
+        self._files_lock = threading.Lock()
+        self._register_metrics()
         
         # Create logs directory if it doesn't exist
         Path('logs').mkdir(exist_ok=True)
@@ -73,31 +97,146 @@ class WhisperSync:
         except Exception as e:
             logger.error(f"Error loading config: {e}")
             return {"sync_directory": "sync_data", "max_retries": 3}
+
+    def _open_store(self):
+        """Open the storage backend selected by the ``storage`` config key"""
+        storage = self.config.get('storage', 'json')
+        codec = get_codec(self.config.get('record_format', 'json'))
+        if storage == 'partitioned':
+            return PartitionedStore(
+                self.sync_directory,
+                partition_by=self.config.get('partition_by', 'day'),
+                max_segment_bytes=self.config.get('segment_max_bytes', 64 << 20),
+                codec=codec
+            )
+        if storage == 'segments':
+            return SegmentStore(
+                self.sync_directory,
+                max_segment_bytes=self.config.get('segment_max_bytes', 64 << 20),
+                codec=codec,
+                max_segment_age=self.config.get('segment_max_age', 3600)
+            )
+        return JsonFileStore(self.sync_directory)
+
+    def _open_writer(self) -> Optional[BatchWriter]:
+        """Start the group-commit writer when ``write_mode`` is ``batched``"""
+        if self.config.get('write_mode', 'direct') != 'batched':
+            return None
+        return BatchWriter(
+            self.store,
+            self.index,
+            batch_size=self.config.get('batch_size', 10),
+            max_latency=self.config.get('batch_max_latency', 0.05),
+            max_queue=self.config.get('write_queue_size', 1000),
+            enqueue_timeout=self.config.get('enqueue_timeout', 1.0),
+            lock=self.store_lock
+        )
+
+    def _open_chronos(self) -> Optional[Chronos]:
+        """Heartbeat time series fed by every synced record with a ``status``"""
+        directory = self.config.get('chronos_directory')
+        if not directory:
+            return None
+        return Chronos(directory, up_statuses=self.config.get('up_statuses', UP_STATUSES))
+
+    def _register_metrics(self) -> None:
+        """Scrape-time gauges; a weak reference so metrics never keep us alive"""
+        ref = weakref.ref(self)
+        REGISTRY.gauge("whisper_records", "Sync records in the store",
+                       fn=lambda: ref().index.count() if ref() else 0)
+        REGISTRY.gauge("whisper_files", "Files under sync_directory",
+                       fn=lambda: ref()._file_count() if ref() else 0)
+        REGISTRY.gauge("whisper_pending_writes", "Records queued for the batch writer",
+                       fn=lambda: ref().writer.pending if ref() and ref().writer else 0)
+
+    def _file_count(self) -> int:
+        """
+        Files under sync_directory: walked once, then counted up by ``_written``
+        for the one-file-per-record layout and re-walked after maintenance; the
+        segment layouts are re-walked at most every ``FILES_RECOUNT_SECONDS``
+        """
+        with self._files_lock:
+            stale = (not isinstance(self.store, JsonFileStore)
+                     and time.monotonic() - self._files_counted > FILES_RECOUNT_SECONDS)
+            if self._files is None or stale:
+                self._files_counted = time.monotonic()
+                self._files = sum(len(f) for _, _, f in os.walk(self.sync_directory))
+            return self._files
+
+    def _files_changed(self) -> None:
+        with self._files_lock:
+            self._files = None
+
+    def _written(self, record: Dict[str, Any], future: Future) -> None:
+        """Done callback of every submitted record: only stored records reach Chronos"""
+        if future.exception() is not None:
+            return
+        if self.chronos is not None:
+            try:
+                self.chronos.ingest(record)
+            except Exception as e:
+                logger.error(f"Chronos could not record a heartbeat for {record.get('agent')}: {e}")
+        if isinstance(self.store, JsonFileStore):
+            with self._files_lock:
+                if self._files is not None:
+                    self._files += 1
+
+    def _sync_payload(self, agent_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        timestamp = datetime.now().isoformat()
+        return {
+            "agent": agent_name,
+            "timestamp": timestamp,
+            "data": data,
+            "sync_id": f"{agent_name}_{int(time.time())}"
+        }
+
+    def submit_sync(self, agent_name: str, data: Dict[str, Any]) -> Future:
+        """
+        Queue agent data for the batched writer
+        
+        Args:
+            agent_name: Name of the planetary agent
+            data: Data to synchronize
+            
+        Returns:
+            Future resolving to the record's store position once it is durable
+            (already resolved when ``write_mode`` is ``direct``)
+        
+        Raises:
+            queue.Full: the write queue stayed full for ``enqueue_timeout`` seconds
+        """
+        sync_payload = self._sync_payload(agent_name, data)
+        if self.writer is not None:
+            future = self.writer.submit(sync_payload)
+            future.add_done_callback(lambda f: self._written(sync_payload, f))
+            return future
+        future: Future = Future()
+        with self.store_lock:
+            started = time.perf_counter()
+            position = self.store.write(sync_payload)
+            WRITE_SECONDS.labels("direct").observe(time.perf_counter() - started)
+        self.index.observe(sync_payload, position)
+        future.set_result(position)
+        self._written(sync_payload, future)
+        return future
     
-    def sync_agent_data(self, agent_name: str, data: Dict[str, Any]) -> bool:
+    def sync_agent_data(self, agent_name: str, data: Dict[str, Any], durable: bool = True) -> bool:
         """
         Synchronize data from a planetary agent
         
         Args:
             agent_name: Name of the planetary agent
             data: Data to synchronize
+            durable: In batched mode, wait until the record's batch is written
+                and fsynced; False returns as soon as it is queued
             
         Returns:
             bool: Success status
         """
         try:
-            timestamp = datetime.now().isoformat()
-            sync_file = self.sync_directory / f"{agent_name}_{timestamp}.json"
-            
-            sync_payload = {
-                "agent": agent_name,
-                "timestamp": timestamp,
-                "data": data,
-                "sync_id": f"{agent_name}_{int(time.time())}"
-            }
-            
-            with open(sync_file, 'w') as f:
-                json.dump(sync_payload, f, indent=2)
+            future = self.submit_sync(agent_name, data)
+            if durable:
+                future.result()
             
             logger.info(f"Successfully synced data for agent {agent_name}")
             return True
@@ -117,46 +256,156 @@ class WhisperSync:
             Latest sync data or None if not found
         """
         try:
-            sync_files = list(self.sync_directory.glob(f"{agent_name or '*'}_*.json"))
-            if not sync_files:
-                return None
-            
-            # Get the most recent file
-            latest_file = max(sync_files, key=os.path.getctime)
-            
-            with open(latest_file, 'r') as f:
-                return json.load(f)
+            return self.index.latest(agent_name)
                 
         except Exception as e:
             logger.error(f"Error getting latest sync: {e}")
             return None
     
-    def cleanup_old_syncs(self, days_old: int = 7) -> int:
+    def cleanup_old_syncs(self, days_old: Optional[int] = None) -> int:
         """
-        Clean up sync files older than specified days
+        Clean up syncs older than specified days
         
         Args:
-            days_old: Number of days after which to delete files
+            days_old: Number of days after which to delete syncs for every
+                agent; None applies the ``retention`` config (``default_days``
+                plus per-agent overrides in ``agents``)
             
         Returns:
-            Number of files deleted
+            Number of syncs deleted
         """
         try:
-            cutoff_time = time.time() - (days_old * 24 * 60 * 60)
-            deleted_count = 0
-            
-            for sync_file in self.sync_directory.glob("*.json"):
-                if os.path.getctime(sync_file) < cutoff_time:
-                    os.remove(sync_file)
-                    deleted_count += 1
+            retention = self.config.get('retention', {})
+            now = time.time()
+            if days_old is None:
+                days_old = retention.get('default_days', 7)
+                agent_cutoffs = {agent: now - days * 24 * 60 * 60
+                                 for agent, days in retention.get('agents', {}).items()}
+            else:
+                agent_cutoffs = {}
+            cutoff_time = now - (days_old * 24 * 60 * 60)
+            with self.store_lock:
+                removed = self.store.cleanup(cutoff_time, agent_cutoffs)
+            deleted_count = self._forget(removed)
+            self._files_changed()
             
-            logger.info(f"Cleaned up {deleted_count} old sync files")
+            logger.info(f"Cleaned up {deleted_count} old syncs")
             return deleted_count
             
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
             return 0
     
+    def compact_old_syncs(self, days_old: Optional[int] = None, keep_every: Optional[int] = None) -> int:
+        """
+        Thin out old partitions, keeping every Nth sync (partitioned storage only)
+        
+        Args:
+            days_old: Compact partitions that ended more than this many days
+                ago (default: ``compaction.after_days``)
+            keep_every: Keep one sync in this many (default: ``compaction.keep_every``)
+            
+        Returns:
+            Number of syncs dropped
+        """
+        if not isinstance(self.store, PartitionedStore):
+            logger.info("Compaction needs partitioned storage; skipping")
+            return 0
+        try:
+            compaction = self.config.get('compaction', {})
+            days_old = compaction.get('after_days', 2) if days_old is None else days_old
+            keep_every = compaction.get('keep_every', 10) if keep_every is None else keep_every
+            with self.store_lock:
+                removed = self.store.compact(time.time() - days_old * 24 * 60 * 60, keep_every)
+            dropped = self._forget(removed)
+            self._files_changed()
+            
+            logger.info(f"Compaction dropped {dropped} old syncs")
+            return dropped
+            
+        except Exception as e:
+            logger.error(f"Error during compaction: {e}")
+            return 0
+    
+    def _forget(self, removed: Dict[Optional[str], int]) -> int:
+        """Update the index for removed syncs; returns how many were removed"""
+        if removed and not self.index.forget(removed):
+            self.index.rebuild()
+        return sum(removed.values())
+    
+    def migrate_store(self, source: str, remove: bool = False) -> int:
+        """
+        Copy every sync from another storage layout into the configured one
+        
+        Args:
+            source: Storage type to read (``json`` or ``segments``) from the
+                same sync directory
+            remove: Drop the source data once copied
+            
+        Returns:
+            Number of records copied
+        """
+        if source == 'segments':
+            src = SegmentStore(self.sync_directory)
+        else:
+            src = JsonFileStore(self.sync_directory)
+        with self.store_lock:
+            copied = copy_records(src, self.store)
+        src.close()
+        if remove:
+            if source == 'segments':
+                shutil.rmtree(src.log.directory)
+            else:
+                src.cleanup(float("inf"))
+        self.index.rebuild()
+        self._files_changed()
+        logger.info(f"Migrated {copied} sync records from {source} storage")
+        return copied
+    
+    def import_legacy_syncs(self, directories: List[str], remove: bool = False) -> int:
+        """
+        Import per-sync JSON files written by the original layout
+        
+        Args:
+            directories: Directories holding ``<agent>_*.json`` files
+            remove: Delete each file once it has been imported
+            
+        Returns:
+            Number of records imported
+        """
+        if self.chronos is not None:
+            self.chronos.import_json(directories)
+        imported = import_json_files(self.store, [Path(d) for d in directories], remove=remove)
+        self.index.refresh()
+        self.index.persist(force=True)
+        self._files_changed()
+        logger.info(f"Imported {imported} legacy sync records")
+        return imported
+    
+    def backfill_chronos(self) -> int:
+        """
+        Feed every stored sync record into Chronos, for history written
+        before it was enabled; a second run records the same heartbeats twice
+
+        Returns:
+            Number of heartbeats recorded
+        """
+        if self.chronos is None:
+            raise ValueError("chronos_directory is not configured")
+        with self.store_lock:
+            recorded = self.chronos.import_records(self.store.records())
+        logger.info(f"Backfilled {recorded} heartbeats into Chronos")
+        return recorded
+    
+    def close(self) -> None:
+        """Flush queued writes, then persist the latest-sync manifest"""
+        if self.writer is not None:
+            self.writer.close()
+        self.index.close()
+        self.store.close()
+        if self.chronos is not None:
+            self.chronos.close()
+    
     def health_check(self) -> Dict[str, Any]:
         """
         Perform health check on the whisper sync system
@@ -171,7 +420,11 @@ class WhisperSync:
                 "config_loaded": bool(self.config),
                 "sync_directory_exists": self.sync_directory.exists(),
                 "sync_directory_writable": os.access(self.sync_directory, os.W_OK),
-                "total_sync_files": len(list(self.sync_directory.glob("*.json")))
+                "storage": self.config.get('storage', 'json'),
+                "total_sync_files": self._file_count(),
+                "total_records": self.index.count(),
+                "write_mode": "batched" if self.writer else "direct",
+                "pending_writes": self.writer.pending if self.writer else 0
             }
             
             # Check if all required agents have recent syncs
@@ -179,8 +432,7 @@ class WhisperSync:
             recent_syncs = {}
             
             for agent in agents:
-                latest_sync = self.get_latest_sync(agent)
-                recent_syncs[agent] = latest_sync is not None
+                recent_syncs[agent] = self.index.count(agent) > 0
             
             status['agent_sync_status'] = recent_syncs
             status['agents_synced'] = sum(recent_syncs.values())
@@ -202,10 +454,54 @@ class WhisperSync:
 
 def main():
     """Main execution function for testing"""
+    parser = argparse.ArgumentParser(description="WhisperSync test run and maintenance")
+    parser.add_argument("--import-json", nargs="+", metavar="DIR",
+                        help="import legacy per-sync JSON files (e.g. sync_data sync/data) and exit")
+    parser.add_argument("--migrate-from", choices=["json", "segments"],
+                        help="copy syncs from another storage layout in sync_directory and exit")
+    parser.add_argument("--remove", action="store_true", help="delete source data after importing or migrating")
+    parser.add_argument("--transcribe", nargs="+", metavar="AUDIO",
+                        help="transcribe audio files and sync the transcripts, then exit")
+    parser.add_argument("--agent", default="Earth", help="agent to sync transcripts under (default: Earth)")
+    parser.add_argument("--workers", type=int, help="decode/transcribe files in this many processes")
+    parser.add_argument("--backfill-chronos", action="store_true",
+                        help="record every stored heartbeat in the Chronos time series and exit")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="apply the retention and compaction policies and exit")
+    args = parser.parse_args()
+    
     try:
         # Initialize WhisperSync
         whisper_sync = WhisperSync()
         
+        if args.import_json:
+            print(f"Imported: {whisper_sync.import_legacy_syncs(args.import_json, remove=args.remove)}")
+            whisper_sync.close()
+            return
+        
+        if args.migrate_from:
+            print(f"Migrated: {whisper_sync.migrate_store(args.migrate_from, remove=args.remove)}")
+            whisper_sync.close()
+            return
+        
+        if args.transcribe:
+            from sync.audio_pipeline import AudioPipeline
+            pipeline = AudioPipeline.from_config(whisper_sync, workers=args.workers)
+            print(f"Transcripts: {pipeline.run(args.agent, args.transcribe)}")
+            whisper_sync.close()
+            return
+        
+        if args.backfill_chronos:
+            print(f"Heartbeats: {whisper_sync.backfill_chronos()}")
+            whisper_sync.close()
+            return
+        
+        if args.cleanup:
+            print(f"Deleted: {whisper_sync.cleanup_old_syncs()}")
+            print(f"Compacted: {whisper_sync.compact_old_syncs()}")
+            whisper_sync.close()
+            return
+        
         # Perform health check
         health = whisper_sync.health_check()
         print(f"Health Check: {json.dumps(health, indent=2)}")
@@ -225,6 +521,7 @@ def main():
         if latest:
             print(f"Latest sync: {json.dumps(latest, indent=2)}")
         
+        whisper_sync.close()
         logger.info("WhisperSync test completed successfully")
         
     except Exception as e: